@@ -5,6 +5,13 @@
 Place the module in your working directory and type 'import p1', then call a
 particular function using method notation, e.g. p1.deck() to initialise a deck
 of cards. Requires Python 3.
+
+The module itself only depends on the standard library: it holds the deck and
+the pure-Python functions to draw cards, convert them to values and sum hands,
+so that it imports quickly, e.g. in short-lived worker processes. All other
+functions (vectorised engines, statistics, plots, sweeps) live in
+p1_analysis.py, which depends on NumPy and SciPy and is only imported the
+first time one of them is accessed as p1.<function>.
 """
 
 def deck():
@@ -18,8 +25,9 @@ def deck():
 def draw(n_cards, replacement=False):
     """Draw up to n unique cards from a deck with or without replacement.
 
-    Randomly draw n unique cards from a standard deck until the desired number
-    (n_cards) is reached.
+    Randomly draw n cards from a standard deck. Without replacement, take an
+    exact random sample of n distinct cards (partial Fisher-Yates shuffle via
+    random.sample), so the cost does not grow sharply as n approaches 52.
 
     Arguments:
         n_cards --- int. A non-negative integer in [0, 52] if 'replacement' is
@@ -33,25 +41,17 @@ def draw(n_cards, replacement=False):
     # If replacement is True, the same card can be picked multiple times
     if replacement:
 
-        # Initialise hand to the empty list (no card picked yet)
-        hand = []
-
-        # Append a random card to the hand
-        while len(hand) < n_cards:
-            hand.append((random.choice(suits), random.choice(cards)))
+        # Pick n cards independently, each uniformly among the 52 in the deck
+        hand = random.choices(full_deck, k=n_cards)
 
     else:
 
-        # Initialise hand to the empty set (no card picked yet)
-        hand = set()
-
         # Add n unique cards to the hand, if n is less than or equal to total
         # deck size (52)
-        if n_cards > len(suits) * len(cards):
+        if n_cards > len(full_deck):
             raise ValueError('Not enough cards in the deck.')
         else:
-            while len(hand) < n_cards:
-                hand.add((random.choice(suits), random.choice(cards)))
+            hand = set(random.sample(full_deck, n_cards))
 
     return hand
 
@@ -74,6 +74,12 @@ def card_values(hand):
 
     return card_values
 
+# Precompute the 52 (suit, card) pairs and their values once, to sample from
+# in 'draw' and to index in the vectorised engines of p1_analysis.py
+suits, cards = deck()
+full_deck = [(suit, card) for suit in suits for card in cards]
+full_deck_values = card_values(full_deck)
+
 def hands(n_cards, k_hands, replacement=False):
     """Draw n cards with or without replacement for each of k hands.
 
@@ -103,191 +109,52 @@ def hands(n_cards, k_hands, replacement=False):
 
     return hands
 
+def deck_values():
+    """Return the numerical values of all 52 cards in a standard deck.
+
+    Cards are ordered suit by suit, following the lists returned by 'deck'.
+    Special cards are converted as in 'card_values': 'A' = 1, {'J', 'Q', 'K'}
+    = 10.
+    """
+
+    return list(full_deck_values)
+
 def sum_hands(hands):
     """Sum card values for each of the k hands.
 
     Return the sum of the card values, for each of the k hands provided.
 
     Arguments:
-        hands -- list of lists. Output of the function 'hands'.
+        hands -- list of lists or np.ndarray. Output of either function:
+            'hands', 'fast_hands'.
     """
 
+    # Sum along rows if hands come from 'fast_hands', avoiding Python loops
+    if hasattr(hands, 'ndim') and hands.ndim == 2:
+        return hands.sum(axis=1)
+
     # Give me the sum, for each of the hands provided
     sum_hands = [sum(hand) for hand in hands]
 
     return sum_hands
 
-def histogram(values, title, xlabel, ylabel, step=1, rotation=0, density=False,
-              normalised=False):
-    """Plot the empirical distribution of card draws.
-
-    Arguments:
-        values -- list. Output of either of the two functions: 'card_values',
-            'sum_trials'.
-        title, xlabel, ylabel -- str. Title and x- and y- labels of the plot.
-
-    Keyword arguments:
-        step -- int. Set bin width (default 1).
-        rotation -- int. Rotate xticklabels, in degrees. A common alternative
-            is 90 (default 0).
-        density -- bool. If True, fit a Gaussian pdf to the histogram data
-            (default False).
-        normalised -- bool. If True, normalise the histogram so that total area
-            is equal to 1 (default False).
-    """
-    import numpy as np
-    from scipy import stats
-    import matplotlib.pyplot as plt
-    import matplotlib.mlab as mlab
-    import seaborn as sns
-
-    # Define figure size and Axes class (use object-oriented methods)
-    plt.figure(figsize=(6, 6))
-    ax = plt.axes()
-
-    # If True, fit a Gaussian density to data and plot it against the histogram
-    if density:
-
-        # Automatically normalise the histogram to ensure correct density
-        # visualisation
-        bins = np.arange(0, np.max(values) + 2, step) - 0.5 * step
-        ax.hist(values, bins=bins, color='#31678dff', edgecolor='k',
-                normed=True)
+def __getattr__(name):
+    """Load the analysis layer lazily, on first access to one of its names."""
 
-        # Retrieve density parameters mu and sigma from input data
-        mu, sigma = stats.norm.fit(values)
+    # Leave special names (e.g., __path__, __file__) to the default lookup
+    if name.startswith('__'):
+        raise AttributeError(name)
 
-        # Generate x-axis values for the density, set to 1000 to ensure
-        # smoothness
-        x = np.linspace(np.min(values) - 0.5 * step, np.max(values) \
-            + 0.5 * step, 1000)
+    import p1_analysis
 
-        # Generate density values for each provided x-axis value
-        y = mlab.normpdf(x, mu, sigma)
-
-        # Plot the density over the histogram
-        density = ax.plot(x, y, color='#5cc863ff')
-
-    else:
+    try:
+        return getattr(p1_analysis, name)
+    except AttributeError:
+        raise AttributeError("module 'p1' has no attribute '{}'"
+                             .format(name)) from None
 
-        # Return either normalised or non-normalised histogram, based on user
-        # input
-        bins = np.arange(0, np.max(values) + 2, step) - 0.5 * step
-        ax.hist(values, bins=bins, color='#31678dff', edgecolor='k',
-                normed=normalised)
+def __dir__():
+    """List core and analysis functions, e.g. for tab completion."""
+    import p1_analysis
 
-    # Add title and axes labels
-    ax.set_title(title)
-    ax.set_xlabel(xlabel)
-    ax.set_ylabel(ylabel)
-
-    # Define x-axis limits
-    ax.set_xlim(np.min(values) - 0.5 * step, np.max(values) + 0.5 * step)
-
-    # Set x-axis ticks and rotate labels, if applicable
-    xticks = np.arange(np.min(values), np.max(values) + 1, step)
-    ax.set_xticks(xticks)
-    ax.set_xticklabels(xticks, rotation=rotation)
-
-def statistics(draws, df=0, sample_bias=True, output=False):
-    """Print measures of location, scale, and shape.
-
-    Calculate and print useful measures of location (mean, median), scale
-    (standard deviation, interquartile range), and shape (skewness, excess
-    kurtosis).
-
-    Arguments:
-        draws -- list. Output of either function: 'card_values', 'sum_trials'.
-
-    Keyword arguments:
-        df -- int. Number of degrees of freedom. Input 1 for Bessel's correction
-            for finite samples (default 0).
-        sample_bias -- bool. If False, provides sample bias correction for
-            skewness and excess kurtosis (default True).
-        output -- bool. If True, the function also returns mean and standard
-            deviation of the data (default False).
-    """
-    import numpy as np
-    from scipy import stats
-
-    mean = np.average(draws)
-    median = np.median(draws)
-
-    # Measures of dispersion (scale)
-    standard_deviation = np.std(draws, ddof=df)
-    q25, q75 = np.percentile(draws, [25, 75])
-
-    # Measure of shape
-    skewness = stats.skew(draws, bias=sample_bias)
-    excess_kurtosis = stats.kurtosis(draws, bias=sample_bias)
-
-    # Print statistics in a user-friendly format
-    print('Mean: {:.2f}'.format(mean))
-    print('Median: {:.2f}'.format(median))
-    print('Standard deviation: {:.2f}'.format(standard_deviation))
-    print('Skewness: {:.4f}'.format(skewness))
-    print('Excess kurtosis: {:.4f}'.format(excess_kurtosis))
-    print('Interquartile range: {:.0f} - {:.0f} = {:.0f}'\
-          .format(q75, q25, q75 - q25))
-
-    # Also return mean and standard deviation if set to True
-    if output:
-        return mean, standard_deviation
-
-def confidence_interval(m, s, n, alpha):
-    """Print confidence intervals for the mean with unknown population variance.
-
-    Compute and print confidence intervals for the mean when population variance
-    is unknown.
-
-    Arguments:
-        m -- float. The sample mean, output of the function 'statistics'.
-        s -- float. The sample standard deviation, also an output of the
-            function 'statistics'.
-        n -- int. The sample size.
-        alpha -- float. The significance level, alpha in [0, 1], e.g.
-            alpha = 0.05 for the 95% c.l.
-    """
-    import numpy as np
-    from scipy import stats
-
-    # Compute one-tailed Student's t quantile with (0.5 * alpha) significance
-    # per tail, n - 1 degrees of freedom
-    t = stats.t.ppf(1 - (0.5 * alpha), n - 1)
-
-    # Compute lower and upper confidence intervals for the mean
-    lower = m - t * s / np.sqrt(n)
-    upper = m + t * s / np.sqrt(n)
-
-    print('{:.0f}% confidence interval for the population mean:\n'\
-          .format((1 - alpha) * 100))
-    print('Sample size: {:.0f}'.format(n))
-    print('Sample mean: {:.2f}'.format(m))
-    print('Sample standard deviation: {:.2f}'.format(s))
-    print('\n(lower; upper) = ({:.4f}; {:.4f})'.format(lower, upper))
-
-def tcdf(x, m, s, n, upper=False):
-    """Compute Student's t cumulative distribution function (cdf).
-
-    Compute Student's t cumulative distribution function, F(x) = P(X <= x).
-    Compute 1 - F(x)if upper = True.
-
-    Arguments:
-        x -- int or float. Realisation of random variable X.
-        m -- float. The sample mean, output of the function 'statistics'.
-        s -- float. The sample standard deviation, output of the function
-            'statistics'.
-        n: int. The sample size.
-
-    Keyword arguments:
-        upper: bool. If True, print 1 - F(x) = P(X >= x) (default False).
-    """
-    from scipy import stats
-
-    # If upper is set to True, compute 1 - F(x); else, compute F(x)
-    if upper:
-        tcdf = 1 - stats.t.cdf(x, n - 1, m, s)
-        print('P(X >= %s) = %.4f'%(x, tcdf))
-    else:
-        tcdf = stats.t.cdf(x, n - 1, m, s)
-        print('P(X <= %s) = %.4f'%(x, tcdf))
+    return sorted(set(globals()) | set(p1_analysis.__all__))
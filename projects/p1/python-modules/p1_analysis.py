@@ -0,0 +1,859 @@
+"""Udacity Data Analyst Nanodegree: P1 Compute Statistics From Card Draws
+
+(2017) Federico Maria Massari / federico.massari@bocconialumni.it
+
+Analysis layer of p1.py: vectorised and parallel engines, exact and streaming
+statistics, plots, confidence intervals and parameter sweeps. There is no need
+to import this module directly; its functions are loaded on first access
+through p1, e.g. p1.statistics(). Requires Python 3, NumPy and SciPy;
+'histogram' also requires Matplotlib and Seaborn.
+"""
+
+import numpy as np
+from scipy import stats
+
+from p1 import deck_values, sum_hands
+
+__all__ = ['fast_hands', 'hand_block', 'parallel_hands', 'exact_pmf',
+           'histogram', 'weighted_moments', 'central_moments_statistics',
+           'weighted_percentile', 'statistics', 'print_statistics',
+           'hand_chunks', 'accumulate', 'streaming_statistics',
+           'confidence_interval', 'tcdf', 'confidence_intervals', 'tcdfs',
+           'sweep_cell', 'sweep']
+
+def fast_hands(n_cards, k_hands, replacement=False, seed=None,
+               chunk_size=100000):
+    """Draw n cards with or without replacement for each of k hands, at once.
+
+    Vectorised version of the function 'hands'. All k hands are drawn in a
+    single batch as a (k, n) integer array of card positions in the deck,
+    then converted to card values by array indexing. Without replacement, each
+    hand is the first n positions of a random permutation of the deck (argsort
+    of uniform random keys); with replacement, positions are drawn uniformly
+    with Generator.integers(). Hands are generated in chunks of at most
+    'chunk_size' rows to limit the memory used by the random keys.
+
+    Arguments:
+        n_cards -- int. An integer in [0, 52] if 'replacement' is omitted.
+            Else, an integer in [0, Inf).
+        k_hands -- int. A non-negative integer, the number of hands (i.e.,
+            experiment repetitions).
+
+    Keyword arguments:
+        replacement -- bool. If True, replace the card in the deck after draw
+            (default False).
+        seed -- None, int, np.random.SeedSequence or np.random.Generator. Seed
+            or generator passed to np.random.default_rng (default None).
+        chunk_size -- int. Maximum number of hands drawn per batch (default
+            100000).
+
+    Returns:
+        A (k_hands, n_cards) np.ndarray of card values, accepted by the
+        functions 'sum_hands', 'statistics' and 'histogram'.
+    """
+
+    values = np.array(deck_values(), dtype=np.int64)
+
+    if not replacement and n_cards > len(values):
+        raise ValueError('Not enough cards in the deck.')
+
+    rng = np.random.default_rng(seed)
+    positions = np.empty((k_hands, n_cards), dtype=np.int64)
+
+    for start in range(0, k_hands, chunk_size):
+        stop = min(start + chunk_size, k_hands)
+
+        if replacement:
+            positions[start:stop] = rng.integers(0, len(values),
+                                                 size=(stop - start, n_cards))
+        else:
+            # Sorting uniform keys gives a random permutation of the deck;
+            # keep the first n positions of each row
+            keys = rng.random((stop - start, len(values)))
+            positions[start:stop] = np.argsort(keys, axis=1)[:, :n_cards]
+
+    return values[positions]
+
+def hand_block(args):
+    """Draw one block of hands for 'parallel_hands' (process pool worker).
+
+    Arguments:
+        args -- tuple. (n_cards, k_hands, replacement, seed_sequence, sums),
+            with seed_sequence an np.random.SeedSequence spawned for the block.
+    """
+    n_cards, k_hands, replacement, seed_sequence, sums = args
+    block = fast_hands(n_cards, k_hands, replacement, seed=seed_sequence)
+
+    return sum_hands(block) if sums else block
+
+def parallel_hands(n_cards, k_hands, replacement=False, seed=None,
+                   workers=None, block_size=100000, sums=True):
+    """Draw k hands of n cards in parallel, reproducibly for a given seed.
+
+    Split the k hands into blocks of fixed size 'block_size', and give each
+    block an independent generator spawned from np.random.SeedSequence(seed).
+    Blocks are drawn with 'fast_hands' across a pool of worker processes and
+    merged in order, so the same seed yields bit-identical results for any
+    number of workers.
+
+    Arguments:
+        n_cards -- int. An integer in [0, 52] if 'replacement' is omitted.
+            Else, an integer in [0, Inf).
+        k_hands -- int. A non-negative integer, the number of hands (i.e.,
+            experiment repetitions).
+
+    Keyword arguments:
+        replacement -- bool. If True, replace the card in the deck after draw
+            (default False).
+        seed -- None, int or np.random.SeedSequence. Root seed of the
+            experiment. If None, fresh entropy is used (default None).
+        workers -- int. Number of worker processes; if 1, draw all blocks in
+            the current process. If None, use os.cpu_count() (default None).
+        block_size -- int. Number of hands per block. Changing it changes the
+            random streams, hence the results (default 100000).
+        sums -- bool. If True, return the sum of each hand as in 'sum_hands';
+            otherwise return card values as in 'fast_hands' (default True).
+
+    Returns:
+        A (k_hands,) np.ndarray of hand sums, or a (k_hands, n_cards)
+        np.ndarray of card values if 'sums' is False.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    # The block layout depends on k_hands and block_size only, never on the
+    # number of workers
+    sizes = [min(block_size, k_hands - start)
+             for start in range(0, k_hands, block_size)]
+    tasks = [(n_cards, size, replacement, child, sums)
+             for size, child in zip(sizes, seed.spawn(len(sizes)))]
+
+    if workers == 1 or len(tasks) <= 1:
+        blocks = [hand_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(hand_block, tasks))
+
+    if not blocks:
+        return np.empty((0,) if sums else (0, n_cards), dtype=np.int64)
+
+    return np.concatenate(blocks)
+
+def exact_pmf(n_cards, replacement=False):
+    """Compute the exact distribution of the sum of n card values.
+
+    Convolve the distribution of card values in the deck returned by 'deck',
+    instead of estimating it by simulation. With replacement, the probability
+    mass function (pmf) of one card is convolved with itself n times. Without
+    replacement, a dynamic programme over the multiset of values counts the
+    ways to pick c cards of each value (binomial coefficients) for every
+    partial hand size and sum, then divides by the number of n-card hands.
+
+    Arguments:
+        n_cards -- int. An integer in [0, 52] if 'replacement' is omitted.
+            Else, an integer in [0, Inf).
+
+    Keyword arguments:
+        replacement -- bool. If True, replace the card in the deck after draw
+            (default False).
+
+    Returns:
+        A tuple (values, probabilities) of np.ndarrays: the support of the sum,
+        from the lowest to the highest attainable value, and the probability
+        of each value. Pass it to 'statistics' (as 'weights'),
+        'confidence_interval' and 'tcdf' (as 'pmf').
+    """
+    from math import comb
+
+    values, counts = np.unique(deck_values(), return_counts=True)
+    n_deck = counts.sum()
+
+    if replacement:
+
+        # Single card pmf, indexed by card value
+        single = np.zeros(values.max() + 1)
+        single[values] = counts / n_deck
+
+        pmf = np.ones(1)
+        for card in range(n_cards):
+            pmf = np.convolve(pmf, single)
+
+    else:
+        if n_cards > n_deck:
+            raise ValueError('Not enough cards in the deck.')
+
+        # ways[c, s]: number of c-card subsets of the values processed so far
+        # whose sum is s. Counts are bounded by comb(52, 26) < 2 ** 53, so
+        # int64 arithmetic is exact
+        max_sum = n_cards * values.max()
+        ways = np.zeros((n_cards + 1, max_sum + 1), dtype=np.int64)
+        ways[0, 0] = 1
+
+        for value, count in zip(values, counts):
+            updated = np.zeros_like(ways)
+            for c in range(min(count, n_cards) + 1):
+                shift = c * value
+                updated[c:, shift:] += comb(int(count), c) \
+                    * ways[:n_cards + 1 - c, :max_sum + 1 - shift]
+            ways = updated
+
+        pmf = ways[n_cards] / comb(int(n_deck), n_cards)
+
+    # Trim the support to the attainable sums
+    support = np.flatnonzero(pmf)
+    low, high = support[0], support[-1]
+
+    return np.arange(low, high + 1), pmf[low:high + 1]
+
+def histogram(values, title, xlabel, ylabel, step=1, rotation=0, density=False,
+              normalised=False, counts=None):
+    """Plot the empirical distribution of card draws.
+
+    Arguments:
+        values -- list or np.ndarray. Output of any of the functions:
+            'card_values', 'fast_hands', 'sum_hands'. If 'counts' is given,
+            the distinct values counted, or None for 0, 1, ..., len(counts) - 1.
+        title, xlabel, ylabel -- str. Title and x- and y- labels of the plot.
+
+    Keyword arguments:
+        step -- int. Set bin width (default 1).
+        rotation -- int. Rotate xticklabels, in degrees. A common alternative
+            is 90 (default 0).
+        density -- bool. If True, fit a Gaussian pdf to the histogram data
+            (default False).
+        normalised -- bool. If True, normalise the histogram so that total area
+            is equal to 1 (default False).
+        counts -- list or np.ndarray. Pre-aggregated frequency of each value,
+            e.g. from np.bincount or the 'counts' output of 'accumulate'. If
+            given, plot the counts as bars without the raw sample (default
+            None).
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if counts is not None:
+        counts = np.ravel(counts)
+        if values is None:
+            values = np.arange(len(counts))
+
+        # Only keep values actually observed
+        values = np.ravel(values)[counts > 0]
+        counts = counts[counts > 0]
+
+    else:
+        # Flatten (k, n) arrays of card values, output of 'fast_hands'
+        values = np.ravel(values)
+
+    # Scan the data only once for its range
+    x_min, x_max = np.min(values), np.max(values)
+
+    # Define figure size and Axes class (use object-oriented methods)
+    plt.figure(figsize=(6, 6))
+    ax = plt.axes()
+
+    # Automatically normalise the histogram to ensure correct density
+    # visualisation
+    if density:
+        normalised = True
+
+    # Return either normalised or non-normalised histogram, based on user
+    # input
+    bins = np.arange(0, x_max + 2, step) - 0.5 * step
+
+    if counts is not None:
+
+        # Re-bin the counts (a few distinct values only) and draw them as bars
+        heights, _ = np.histogram(values, bins=bins, weights=counts,
+                                  density=normalised)
+        ax.bar(bins[:-1] + 0.5 * step, heights, width=step, color='#31678dff',
+               edgecolor='k')
+    else:
+        ax.hist(values, bins=bins, color='#31678dff', edgecolor='k',
+                density=normalised)
+
+    # If True, fit a Gaussian density to data and plot it against the histogram
+    if density:
+
+        # Retrieve density parameters mu and sigma from input data
+        if counts is not None:
+            mu, sigma = weighted_moments(values, counts)[:2]
+        else:
+            mu, sigma = stats.norm.fit(values)
+
+        # Generate x-axis values for the density, set to 1000 to ensure
+        # smoothness
+        x = np.linspace(x_min - 0.5 * step, x_max + 0.5 * step, 1000)
+
+        # Generate density values for each provided x-axis value
+        y = stats.norm.pdf(x, mu, sigma)
+
+        # Plot the density over the histogram
+        density = ax.plot(x, y, color='#5cc863ff')
+
+    # Add title and axes labels
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+    # Define x-axis limits
+    ax.set_xlim(x_min - 0.5 * step, x_max + 0.5 * step)
+
+    # Set x-axis ticks and rotate labels, if applicable
+    xticks = np.arange(x_min, x_max + 1, step)
+    ax.set_xticks(xticks)
+    ax.set_xticklabels(xticks, rotation=rotation)
+
+def weighted_moments(values, weights, df=0, sample_bias=True):
+    """Compute mean, standard deviation, skewness and excess kurtosis.
+
+    Moments of a distribution given as distinct values and their weights, i.e.
+    either frequencies (e.g., counts of sampled sums) or probabilities (e.g.,
+    output of 'exact_pmf'). With frequencies, the results equal those of
+    'statistics' on the expanded sample.
+
+    Arguments:
+        values -- list or np.ndarray. Distinct values.
+        weights -- list or np.ndarray. Frequency or probability of each value.
+
+    Keyword arguments:
+        df -- int. Number of degrees of freedom, as in 'statistics'. Only
+            meaningful for frequencies (default 0).
+        sample_bias -- bool. If False, correct skewness and excess kurtosis for
+            sample bias, as in 'statistics'. Only meaningful for frequencies
+            (default True).
+    """
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    N = weights.sum()
+
+    mean = np.dot(weights, values) / N
+    deviations = values - mean
+    m2, m3, m4 = [np.dot(weights, deviations ** k) / N for k in (2, 3, 4)]
+
+    return (mean,) + central_moments_statistics(N, m2, m3, m4, df,
+                                                sample_bias)
+
+def central_moments_statistics(N, m2, m3, m4, df=0, sample_bias=True):
+    """Convert central moments into standard deviation, skewness and kurtosis.
+
+    Arguments:
+        N -- int or float. Sample size (1 for probability distributions).
+        m2, m3, m4 -- float. Second, third and fourth central moments, i.e.
+            the average of (x - mean) ** k.
+
+    Keyword arguments:
+        df, sample_bias -- As in 'statistics'.
+    """
+
+    standard_deviation = np.sqrt(m2 * N / (N - df))
+    skewness = m3 / m2 ** 1.5
+    excess_kurtosis = m4 / m2 ** 2 - 3
+
+    # Same bias corrections as scipy.stats.skew and scipy.stats.kurtosis
+    if not sample_bias:
+        skewness *= np.sqrt(N * (N - 1)) / (N - 2)
+        excess_kurtosis = ((N + 1) * excess_kurtosis + 6) * (N - 1) \
+            / ((N - 2) * (N - 3))
+
+    return standard_deviation, skewness, excess_kurtosis
+
+def weighted_percentile(values, weights, q):
+    """Compute percentiles of a distribution given as values and weights.
+
+    With integer frequencies, use the same linear interpolation as
+    np.percentile on the expanded sample. With probabilities, return the
+    exact quantile, i.e. the smallest value x such that F(x) >= q / 100.
+
+    Arguments:
+        values -- list or np.ndarray. Distinct values, in increasing order.
+        weights -- list or np.ndarray. Frequency or probability of each value.
+        q -- float or list of float. Percentile(s) to compute, in [0, 100].
+    """
+
+    values = np.asarray(values)
+    weights = np.asarray(weights)
+    q = np.asarray(q, dtype=float) / 100
+    cumulative = np.cumsum(weights)
+
+    if np.issubdtype(weights.dtype, np.integer):
+
+        # Index of the order statistics surrounding the percentile position
+        position = q * (cumulative[-1] - 1)
+        lower, upper = np.floor(position), np.ceil(position)
+        x_lower = values[np.searchsorted(cumulative, lower, side='right')]
+        x_upper = values[np.searchsorted(cumulative, upper, side='right')]
+
+        return x_lower + (position - lower) * (x_upper - x_lower)
+
+    # Allow for rounding errors in the cumulative probabilities
+    index = np.searchsorted(cumulative, q * cumulative[-1] * (1 - 1e-12))
+
+    return values[np.minimum(index, len(values) - 1)]
+
+def statistics(draws, df=0, sample_bias=True, output=False, weights=None):
+    """Print measures of location, scale, and shape.
+
+    Calculate and print useful measures of location (mean, median), scale
+    (standard deviation, interquartile range), and shape (skewness, excess
+    kurtosis).
+
+    Arguments:
+        draws -- list or np.ndarray. Output of any of the functions:
+            'card_values', 'fast_hands', 'sum_hands'.
+
+    Keyword arguments:
+        df -- int. Number of degrees of freedom. Input 1 for Bessel's correction
+            for finite samples (default 0).
+        sample_bias -- bool. If False, provides sample bias correction for
+            skewness and excess kurtosis (default True).
+        output -- bool. If True, the function also returns mean and standard
+            deviation of the data (default False).
+        weights -- list or np.ndarray. If given, 'draws' are the distinct
+            values of a distribution and 'weights' their frequencies or
+            probabilities, e.g. the output of 'exact_pmf' (default None).
+    """
+
+    # Flatten (k, n) arrays of card values, output of 'fast_hands'
+    draws = np.ravel(draws)
+
+    if weights is not None:
+
+        # Exact or pre-aggregated distribution, no raw sample needed
+        mean, standard_deviation, skewness, excess_kurtosis = \
+            weighted_moments(draws, weights, df, sample_bias)
+        median, q25, q75 = weighted_percentile(draws, weights, [50, 25, 75])
+
+    else:
+        mean = np.average(draws)
+        median = np.median(draws)
+
+        # Measures of dispersion (scale)
+        standard_deviation = np.std(draws, ddof=df)
+        q25, q75 = np.percentile(draws, [25, 75])
+
+        # Measure of shape
+        skewness = stats.skew(draws, bias=sample_bias)
+        excess_kurtosis = stats.kurtosis(draws, bias=sample_bias)
+
+    print_statistics(mean, median, standard_deviation, skewness,
+                     excess_kurtosis, q25, q75)
+
+    # Also return mean and standard deviation if set to True
+    if output:
+        return mean, standard_deviation
+
+def print_statistics(mean, median, standard_deviation, skewness,
+                     excess_kurtosis, q25, q75):
+    """Print the output of 'statistics' in a user-friendly format."""
+
+    print('Mean: {:.2f}'.format(mean))
+    print('Median: {:.2f}'.format(median))
+    print('Standard deviation: {:.2f}'.format(standard_deviation))
+    print('Skewness: {:.4f}'.format(skewness))
+    print('Excess kurtosis: {:.4f}'.format(excess_kurtosis))
+    print('Interquartile range: {:.0f} - {:.0f} = {:.0f}'\
+          .format(q75, q25, q75 - q25))
+
+def hand_chunks(n_cards, k_hands, replacement=False, seed=None,
+                block_size=100000):
+    """Yield the sums of k hands of n cards, one block at a time.
+
+    Same blocks and random streams as 'parallel_hands', so concatenating the
+    chunks gives its output for the same seed, without holding all the sums
+    in memory.
+
+    Arguments:
+        n_cards, k_hands -- int. As in 'fast_hands'.
+
+    Keyword arguments:
+        replacement, seed, block_size -- As in 'parallel_hands'.
+    """
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    sizes = [min(block_size, k_hands - start)
+             for start in range(0, k_hands, block_size)]
+
+    for size, child in zip(sizes, seed.spawn(len(sizes))):
+        yield hand_block((n_cards, size, replacement, child, True))
+
+def accumulate(chunks):
+    """Accumulate count, mean, central moments and histogram of hand sums.
+
+    Consume an iterable of chunks of non-negative integers (e.g., the output
+    of 'hand_chunks') in a single pass. Moments are merged chunk by chunk with
+    Welford-style pairwise update formulas for M2, M3 and M4 (sums of squared,
+    cubed and fourth-power deviations from the mean); values are counted in
+    an exact histogram, since hand sums have a small integer support. Memory
+    use depends on the largest value, not on the number of draws.
+
+    Arguments:
+        chunks -- iterable of lists or np.ndarrays of non-negative integers.
+
+    Returns:
+        A dictionary with keys 'n', 'mean', 'M2', 'M3', 'M4' and 'counts', the
+        latter an np.ndarray with the frequency of each value 0, 1, ....
+    """
+
+    n, mean, M2, M3, M4 = 0, 0., 0., 0., 0.
+    counts = np.zeros(0, dtype=np.int64)
+
+    for chunk in chunks:
+        chunk = np.ravel(chunk)
+        if chunk.size == 0:
+            continue
+        if chunk.min() < 0:
+            raise ValueError('Values must be non-negative integers.')
+
+        # Moments of the chunk alone
+        n_b = chunk.size
+        mean_b = chunk.mean()
+        deviations = chunk - mean_b
+        M2_b, M3_b, M4_b = [np.sum(deviations ** k) for k in (2, 3, 4)]
+
+        # Merge with the running moments
+        n_a, N = n, n + n_b
+        delta = mean_b - mean
+        M4 += M4_b + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b \
+            + n_b ** 2) / N ** 3 + 6 * delta ** 2 * (n_a ** 2 * M2_b \
+            + n_b ** 2 * M2) / N ** 2 + 4 * delta * (n_a * M3_b \
+            - n_b * M3) / N
+        M3 += M3_b + delta ** 3 * n_a * n_b * (n_a - n_b) / N ** 2 \
+            + 3 * delta * (n_a * M2_b - n_b * M2) / N
+        M2 += M2_b + delta ** 2 * n_a * n_b / N
+        mean += delta * n_b / N
+        n = N
+
+        # Update the histogram, growing it if a larger value appears
+        chunk_counts = np.bincount(chunk)
+        if len(chunk_counts) > len(counts):
+            counts = np.pad(counts, (0, len(chunk_counts) - len(counts)))
+        counts[:len(chunk_counts)] += chunk_counts
+
+    return {'n': n, 'mean': mean, 'M2': M2, 'M3': M3, 'M4': M4,
+            'counts': counts}
+
+def streaming_statistics(chunks, df=0, sample_bias=True, output=False):
+    """Print measures of location, scale, and shape, in a single pass.
+
+    Same output as 'statistics' on the concatenated chunks, computed with
+    'accumulate' so that memory stays constant however many draws are made.
+    Median and interquartile range are exact, from the histogram of values.
+
+    Arguments:
+        chunks -- iterable of lists or np.ndarrays of non-negative integers,
+            e.g. the output of 'hand_chunks'.
+
+    Keyword arguments:
+        df, sample_bias, output -- As in 'statistics'.
+    """
+
+    acc = accumulate(chunks)
+    N = acc['n']
+
+    standard_deviation, skewness, excess_kurtosis = \
+        central_moments_statistics(N, acc['M2'] / N, acc['M3'] / N,
+                                   acc['M4'] / N, df, sample_bias)
+    median, q25, q75 = weighted_percentile(np.arange(len(acc['counts'])),
+                                           acc['counts'], [50, 25, 75])
+
+    print_statistics(acc['mean'], median, standard_deviation, skewness,
+                     excess_kurtosis, q25, q75)
+
+    if output:
+        return acc['mean'], standard_deviation
+
+def confidence_interval(m, s, n, alpha, pmf=None):
+    """Print confidence intervals for the mean with unknown population variance.
+
+    Compute and print confidence intervals for the mean when population variance
+    is unknown. If the exact distribution of the data is supplied, take the
+    population mean and standard deviation from it instead, and use Normal
+    quantiles: the result is then not a confidence interval, but a probability
+    interval for the mean of a sample of size n, and is printed as such.
+
+    Arguments:
+        m -- float. The sample mean, output of the function 'statistics'.
+        s -- float. The sample standard deviation, also an output of the
+            function 'statistics'.
+        n -- int. The sample size.
+        alpha -- float. The significance level, alpha in [0, 1], e.g.
+            alpha = 0.05 for the 95% c.l.
+
+    Keyword arguments:
+        pmf -- tuple. Output of the function 'exact_pmf'. If given, 'm' and 's'
+            are ignored and can be None (default None).
+    """
+
+    if pmf is not None:
+
+        # Known population moments: use the standard Normal quantile
+        m, s = weighted_moments(*pmf)[:2]
+        t = stats.norm.ppf(1 - (0.5 * alpha))
+
+    else:
+
+        # Compute one-tailed Student's t quantile with (0.5 * alpha)
+        # significance per tail, n - 1 degrees of freedom
+        t = stats.t.ppf(1 - (0.5 * alpha), n - 1)
+
+    # Compute lower and upper confidence intervals for the mean
+    lower = m - t * s / np.sqrt(n)
+    upper = m + t * s / np.sqrt(n)
+
+    if pmf is not None:
+        print('{:.0f}% probability interval for the mean of {:.0f} draws:\n'\
+              .format((1 - alpha) * 100, n))
+        print('Sample size: {:.0f}'.format(n))
+        print('Population mean: {:.2f}'.format(m))
+        print('Population standard deviation: {:.2f}'.format(s))
+    else:
+        print('{:.0f}% confidence interval for the population mean:\n'\
+              .format((1 - alpha) * 100))
+        print('Sample size: {:.0f}'.format(n))
+        print('Sample mean: {:.2f}'.format(m))
+        print('Sample standard deviation: {:.2f}'.format(s))
+    print('\n(lower; upper) = ({:.4f}; {:.4f})'.format(lower, upper))
+
+def tcdf(x, m, s, n, upper=False, pmf=None):
+    """Compute Student's t cumulative distribution function (cdf).
+
+    Compute Student's t cumulative distribution function, F(x) = P(X <= x).
+    Compute 1 - F(x)if upper = True. If the exact distribution of X is
+    supplied, compute the exact probabilities instead.
+
+    Arguments:
+        x -- int or float. Realisation of random variable X.
+        m -- float. The sample mean, output of the function 'statistics'.
+        s -- float. The sample standard deviation, output of the function
+            'statistics'.
+        n: int. The sample size.
+
+    Keyword arguments:
+        upper: bool. If True, print 1 - F(x) = P(X >= x) (default False).
+        pmf -- tuple. Output of the function 'exact_pmf'. If given, 'm', 's'
+            and 'n' are ignored and can be None (default None).
+    """
+
+    if pmf is not None:
+
+        # Sum the exact probabilities of the values in the requested tail
+        values, probabilities = pmf
+        if upper:
+            tcdf = probabilities[values >= x].sum()
+            print('P(X >= %s) = %.4f'%(x, tcdf))
+        else:
+            tcdf = probabilities[values <= x].sum()
+            print('P(X <= %s) = %.4f'%(x, tcdf))
+
+    # If upper is set to True, compute 1 - F(x); else, compute F(x)
+    elif upper:
+        tcdf = 1 - stats.t.cdf(x, n - 1, m, s)
+        print('P(X >= %s) = %.4f'%(x, tcdf))
+    else:
+        tcdf = stats.t.cdf(x, n - 1, m, s)
+        print('P(X <= %s) = %.4f'%(x, tcdf))
+
+def confidence_intervals(m, s, n, alpha):
+    """Compute confidence intervals for the mean across many experiments.
+
+    Vectorised, non-printing version of 'confidence_interval'. Inputs are
+    broadcast against each other, and all Student's t quantiles are computed
+    in a single scipy call.
+
+    Arguments:
+        m, s -- float or array-like. Sample means and standard deviations.
+        n -- int or array-like. Sample sizes.
+        alpha -- float or array-like. Significance levels, in [0, 1].
+
+    Returns:
+        A 1-D np.ndarray structured array with fields 'm', 's', 'n', 'alpha',
+        't', 'lower', 'upper', one record per experiment. Use
+        pd.DataFrame(result) to obtain a DataFrame.
+    """
+
+    m, s, n, alpha = [np.ravel(a) for a in np.broadcast_arrays(m, s, n, alpha)]
+
+    t = stats.t.ppf(1 - (0.5 * alpha), n - 1)
+    half_width = t * s / np.sqrt(n)
+
+    result = np.empty(len(m), dtype=[('m', float), ('s', float), ('n', int),
+                                     ('alpha', float), ('t', float),
+                                     ('lower', float), ('upper', float)])
+    result['m'], result['s'], result['n'], result['alpha'] = m, s, n, alpha
+    result['t'] = t
+    result['lower'] = m - half_width
+    result['upper'] = m + half_width
+
+    return result
+
+def tcdfs(x, m, s, n, upper=False):
+    """Compute Student's t cdf across many realisations and experiments.
+
+    Vectorised, non-printing version of 'tcdf'. Inputs are broadcast against
+    each other, and all probabilities are computed in a single scipy call.
+
+    Arguments:
+        x -- int, float or array-like. Realisations of random variable X.
+        m, s -- float or array-like. Sample means and standard deviations.
+        n -- int or array-like. Sample sizes.
+
+    Keyword arguments:
+        upper -- bool or array-like. If True, compute 1 - F(x) = P(X >= x)
+            (default False).
+
+    Returns:
+        A 1-D np.ndarray structured array with fields 'x', 'm', 's', 'n',
+        'upper', 'p', one record per input combination.
+    """
+
+    x, m, s, n, upper = [np.ravel(a) for a
+                         in np.broadcast_arrays(x, m, s, n, upper)]
+
+    p = stats.t.cdf(x, n - 1, m, s)
+    p = np.where(upper, 1 - p, p)
+
+    result = np.empty(len(x), dtype=[('x', float), ('m', float), ('s', float),
+                                     ('n', int), ('upper', bool),
+                                     ('p', float)])
+    result['x'], result['m'], result['s'], result['n'] = x, m, s, n
+    result['upper'], result['p'] = upper, p
+
+    return result
+
+def sweep_cell(args):
+    """Summarise one (n_cards, k_hands, replacement) cell for 'sweep'.
+
+    Arguments:
+        args -- tuple. (n_cards, k_hands, replacement, seed, alpha, df,
+            sample_bias, block_size), as in 'sweep'.
+
+    Returns:
+        A dictionary with the moments, quartiles and confidence interval for
+        the mean of the sums of k hands of n cards.
+    """
+
+    n_cards, k_hands, replacement, seed, alpha, df, sample_bias, block_size \
+        = args
+
+    if k_hands <= 0:
+        raise ValueError('The number of hands must be a positive integer.')
+
+    # Derive the cell stream from the root seed and the cell parameters, so
+    # that results do not depend on the grid the cell belongs to
+    seed_sequence = np.random.SeedSequence([seed, n_cards, k_hands,
+                                            int(replacement)])
+    acc = accumulate(hand_chunks(n_cards, k_hands, replacement, seed_sequence,
+                                 block_size))
+    N = acc['n']
+
+    standard_deviation, skewness, excess_kurtosis = \
+        central_moments_statistics(N, acc['M2'] / N, acc['M3'] / N,
+                                   acc['M4'] / N, df, sample_bias)
+    median, q25, q75 = weighted_percentile(np.arange(len(acc['counts'])),
+                                           acc['counts'], [50, 25, 75])
+
+    t = stats.t.ppf(1 - (0.5 * alpha), N - 1)
+    half_width = t * standard_deviation / np.sqrt(N)
+
+    return {'mean': float(acc['mean']),
+            'standard_deviation': float(standard_deviation),
+            'skewness': float(skewness),
+            'excess_kurtosis': float(excess_kurtosis),
+            'median': float(median), 'q25': float(q25), 'q75': float(q75),
+            'lower': float(acc['mean'] - half_width),
+            'upper': float(acc['mean'] + half_width)}
+
+def sweep(n_values, k_values, replacement_values=(False, True), seed=0,
+          alpha=0.05, df=0, sample_bias=True, block_size=100000,
+          cache_dir='p1_sweep_cache', workers=None):
+    """Run hands -> sums -> statistics over a grid of experiments, with cache.
+
+    For every combination of n_cards, k_hands and replacement, draw the hand
+    sums in a single pass ('hand_chunks', 'accumulate') and store a summary
+    (moments, quartiles, confidence interval for the mean) in a JSON file in
+    'cache_dir', keyed by the cell parameters and the seed. Cells already in
+    the cache are read back; only the new ones are computed, in parallel, and
+    each is stored as soon as it completes, so an interrupted sweep keeps the
+    cells already done.
+
+    Arguments:
+        n_values -- iterable of int. Numbers of cards per hand.
+        k_values -- iterable of int. Numbers of hands.
+
+    Keyword arguments:
+        replacement_values -- iterable of bool. Draw types to run (default
+            (False, True)).
+        seed -- int. Root seed; each cell derives its own stream from it and
+            from its parameters (default 0).
+        alpha -- float. Significance level of the confidence intervals
+            (default 0.05).
+        df, sample_bias -- As in 'statistics'.
+        block_size -- int. As in 'parallel_hands' (default 100000).
+        cache_dir -- str. Folder of the on-disk cache, created if missing
+            (default 'p1_sweep_cache').
+        workers -- int. Number of worker processes; if 1, compute all cells in
+            the current process. If None, use os.cpu_count() (default None).
+
+    Returns:
+        A 1-D np.ndarray structured array, one record per cell in grid order,
+        with the cell parameters and the fields returned by 'sweep_cell'.
+    """
+    import os
+    import json
+    import itertools
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    cells = list(itertools.product(n_values, k_values, replacement_values))
+    tasks = [(n_cards, k_hands, bool(replacement), seed, alpha, df,
+              sample_bias, block_size)
+             for n_cards, k_hands, replacement in cells]
+
+    def cache_path(task):
+        key = 'n{}_k{}_r{:d}_seed{}_alpha{}_df{}_bias{:d}_block{}'.format(*task)
+        return os.path.join(cache_dir, key + '.json')
+
+    summaries = {}
+    for task in tasks:
+        if os.path.exists(cache_path(task)):
+            with open(cache_path(task), 'r') as f:
+                summaries[task] = json.load(f)
+
+    def store(task, summary):
+        """Write a new cell from this process only, through a temporary file,
+        so a partially written cache entry is never read back.
+        """
+        summaries[task] = summary
+        with open(cache_path(task) + '.tmp', 'w') as f:
+            json.dump(summary, f)
+        os.replace(cache_path(task) + '.tmp', cache_path(task))
+
+    missing = [task for task in tasks if task not in summaries]
+    if workers == 1 or len(missing) <= 1:
+        for task in missing:
+            store(task, sweep_cell(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(sweep_cell, task): task
+                       for task in missing}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+
+    fields = ['mean', 'standard_deviation', 'skewness', 'excess_kurtosis',
+              'median', 'q25', 'q75', 'lower', 'upper']
+    result = np.empty(len(tasks), dtype=[('n_cards', int), ('k_hands', int),
+                                         ('replacement', bool)] \
+                      + [(field, float) for field in fields])
+
+    for i, task in enumerate(tasks):
+        result[i] = task[:3] + tuple(summaries[task][field]
+                                     for field in fields)
+
+    return result
@@ -0,0 +1,92 @@
+"""Udacity Data Analyst Nanodegree: P1 Compute Statistics From Card Draws
+
+Regression benchmarks for the card drawing functions in p1.py.
+
+Run from the same directory as p1.py with 'python p1_benchmarks.py'. Requires
+Python 3.
+"""
+
+import subprocess
+import sys
+import timeit
+
+import p1
+
+def benchmark_draw(n_values=(5, 13, 26, 39, 45, 48, 50, 51, 52), number=2000,
+                   repeat=5):
+    """Time p1.draw() without replacement for increasing hand sizes.
+
+    The rejection sampling previously used by 'draw' behaved like a coupon
+    collector, so its cost exploded as n_cards approached 52. An exact sample
+    keeps the cost per drawn card roughly constant.
+
+    Keyword arguments:
+        n_values -- iterable of int. Hand sizes to time, in [0, 52].
+        number -- int. Number of draws per timing run (default 2000).
+        repeat -- int. Number of timing runs; the best is kept (default 5).
+
+    Returns:
+        A dictionary of the form {n_cards: seconds per draw}.
+    """
+    timings = {}
+    for n_cards in n_values:
+        best = min(timeit.repeat(lambda: p1.draw(n_cards), number=number,
+                                 repeat=repeat))
+        timings[n_cards] = best / number
+        print('draw({:2d}): {:8.2f} us'.format(n_cards, 1e6 * timings[n_cards]))
+
+    return timings
+
+def check_flat(timings, tolerance=2.0):
+    """Raise AssertionError if the cost per card grows with n_cards.
+
+    Compare the time per drawn card for the full deck with the one for the
+    smallest hand size timed, allowing for a 'tolerance' factor.
+    """
+    smallest = min(n for n in timings if n > 0)
+    largest = max(timings)
+    ratio = (timings[largest] / largest) / (timings[smallest] / smallest)
+
+    print('Cost per card, n = {} vs n = {}: {:.2f}x'.format(largest, smallest,
+                                                             ratio))
+    assert ratio < tolerance, 'draw() cost per card grows with n_cards.'
+
+def benchmark_import(statement='import p1; p1.hands(5, 100)', repeat=5):
+    """Time a cold start of a Python process running 'statement'.
+
+    Each run spawns a fresh interpreter, as a short-lived worker process would.
+    The baseline is the start-up time of an interpreter running 'pass'.
+
+    Keyword arguments:
+        statement -- str. Code to run in the new process (default draws 100
+            hands with the pure-Python core of p1).
+        repeat -- int. Number of runs; the best is kept (default 5).
+
+    Returns:
+        A tuple (seconds for 'statement', seconds for the baseline).
+    """
+    def best_time(code):
+        return min(timeit.repeat(lambda: subprocess.run([sys.executable, '-c',
+                   code], check=True), number=1, repeat=repeat))
+
+    timing = best_time(statement)
+    baseline = best_time('pass')
+    print('Cold start, {!r}: {:.1f} ms ({:.1f} ms over bare interpreter)'
+          .format(statement, 1e3 * timing, 1e3 * (timing - baseline)))
+
+    return timing, baseline
+
+def check_lightweight_core():
+    """Raise AssertionError if using the p1 core imports NumPy or SciPy."""
+    code = ('import sys, p1; p1.sum_hands(p1.hands(5, 10)); '
+            'assert not {"numpy", "scipy", "matplotlib"} & set(sys.modules)')
+    result = subprocess.run([sys.executable, '-c', code])
+
+    assert result.returncode == 0, 'p1 core imports heavy dependencies.'
+    print('p1 core runs without importing NumPy, SciPy or Matplotlib.')
+
+if __name__ == '__main__':
+    check_flat(benchmark_draw())
+    check_lightweight_core()
+    benchmark_import()
+    benchmark_import('import p1; p1.statistics')
@@ -6,9 +6,40 @@ Place the module in your working directory and type 'import p2', then call a
 particular function using method notation. Requires Python 3.
 """
 
+from collections import OrderedDict
+
+# Age of majority, in years, and titles eligible for a spouse aboard
+MAJORITY_AGE = 18
+SPOUSE_TITLES = ['Mrs', 'Mr', 'Dr']
+
+def majority_labels(age):
+    """Return 'Minor' or 'Adult' for each age, or NaN where the age is missing.
+
+    Shared by 'age_of_majority' (a single age) and 'age_of_majority_column'
+    (a whole column).
+
+    Arguments:
+        age -- int, float or array-like. Age(s) of the passengers, in years.
+
+    Returns:
+        An np.ndarray of object dtype, with the same shape as 'age'.
+    """
+    import numpy as np
+
+    age = np.asarray(age, dtype=float)
+    labels = np.where(age < MAJORITY_AGE, 'Minor', 'Adult').astype(object)
+
+    # Ignore missing values
+    labels[np.isnan(age)] = np.nan
+
+    return labels
+
 def age_of_majority(df, age, new_column_name='Minor/Adult'):
     """Label passenger as 'Minor' or 'Adult' based on age and ignoring NaNs.
 
+    Row-wise version, to use with DataFrame.apply(axis=1). Prefer the much
+    faster 'age_of_majority_column' on large DataFrames.
+
     Arguments:
         df -- pd.DataFrame. Pandas' input DataFrame.
         age -- int or float. The age of the passenger, in years.
@@ -18,13 +49,30 @@ def age_of_majority(df, age, new_column_name='Minor/Adult'):
     """
     import pandas as pd
 
+    label = majority_labels(age)[()]
+
     # Ignore missing values
-    if pd.notnull(age):
+    if pd.notnull(label):
+        df[new_column_name] = label
+
+    return df
+
+def age_of_majority_column(df, age_column='Age', new_column_name='Minor/Adult'):
+    """Label passengers as 'Minor' or 'Adult' based on age and ignoring NaNs.
 
-        if age < 18:
-            df[new_column_name] = 'Minor'
-        else:
-            df[new_column_name] = 'Adult'
+    Vectorised version of 'age_of_majority': label the whole column at once
+    with 'majority_labels', leaving NaN where the age is missing.
+
+    Arguments:
+        df -- pd.DataFrame. Pandas' input DataFrame.
+
+    Keyword arguments:
+        age_column -- str. Name of the column with passenger ages, in years
+            (default 'Age').
+        new_column_name -- str. Title of column to add (default 'Minor/Adult').
+    """
+
+    df[new_column_name] = majority_labels(df[age_column])
 
     return df
 
@@ -52,10 +100,173 @@ def count_unique(df, column_name, new_column_name):
 
     return df
 
+def factorised_counts(values):
+    """Factorise values and count the occurrences of each distinct one.
+
+    Arguments:
+        values -- pd.Series. The values to count.
+
+    Returns:
+        A tuple (codes, uniques, counts): the output of pd.factorize (code -1
+        for missing values) and the np.bincount of the non-missing codes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    return codes, uniques, counts
+
+def gather_by_code(codes, unique_counts):
+    """Gather the count of each distinct value back to every row, by code.
+
+    Missing values (code -1), and NaN counts, are mapped to NaN; counts stay
+    integers if there are none.
+
+    Arguments:
+        codes -- np.ndarray. Integer codes, output of pd.factorize.
+        unique_counts -- np.ndarray. Count of each distinct value, by code.
+    """
+    import numpy as np
+
+    if (codes < 0).any() or np.isnan(unique_counts.astype(float)).any():
+        return np.append(unique_counts.astype(float), np.nan)[codes]
+
+    return unique_counts.astype(np.int64)[codes]
+
+def gather_counts(values, counts):
+    """Map each value to its number of occurrences, via shared factorisation.
+
+    Factorise 'values' once, look up the count of each distinct value in
+    'counts', and gather the counts by integer code. Missing values, and values
+    absent from 'counts', are mapped to NaN, as with Series.map.
+
+    Arguments:
+        values -- pd.Series. The values to encode.
+        counts -- pd.Series. Number of occurrences, indexed by value.
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+
+    return pd.Series(gather_by_code(codes, counts.reindex(uniques).values),
+                     index=values.index)
+
+def value_counts(values):
+    """Count occurrences of non-missing values with np.bincount.
+
+    Arguments:
+        values -- pd.Series. The values to count.
+
+    Returns:
+        A pd.Series of counts, indexed by value.
+    """
+    import pandas as pd
+
+    _, uniques, counts = factorised_counts(values)
+
+    return pd.Series(counts, index=uniques)
+
+def count_unique_columns(df, column_names, new_column_names):
+    """Count occurrences of unique entries in many columns and map results.
+
+    Vectorised, multi-column version of 'count_unique'. Each column is
+    factorised once ('factorised_counts'); occurrences are counted with
+    np.bincount on the integer codes and gathered back by code
+    ('gather_by_code'), instead of building and mapping a Python dictionary
+    per column.
+
+    Arguments:
+        df -- pd.DataFrame. The DataFrame to expand.
+        column_names -- list of str. The names of the columns from which to
+            count the occurrences.
+        new_column_names -- list of str. The names of the new columns in which
+            to store the results, one per column in 'column_names'.
+    """
+    for column_name, new_column_name in zip(column_names, new_column_names):
+        codes, _, counts = factorised_counts(df[column_name])
+
+        # Missing values are not counted, and mapped to NaN
+        df[new_column_name] = gather_by_code(codes, counts)
+
+    return df
+
+def running_counts(chunks, column_names, counts=None):
+    """Count occurrences of unique entries in many columns, chunk by chunk.
+
+    First pass of out-of-core frequency encoding: keep running counts across
+    a stream of DataFrame chunks, e.g. pd.read_csv(..., chunksize=...).
+
+    Arguments:
+        chunks -- iterable of pd.DataFrame.
+        column_names -- list of str. The names of the columns to count.
+
+    Keyword arguments:
+        counts -- dict. Running counts from previous chunks, to update (default
+            None, start from scratch).
+
+    Returns:
+        A dictionary {column name: pd.Series of counts indexed by value}.
+    """
+    import pandas as pd
+
+    if counts is None:
+        counts = {column_name: pd.Series(dtype='int64')
+                  for column_name in column_names}
+
+    for chunk in chunks:
+        for column_name in column_names:
+            counts[column_name] = counts[column_name].add(
+                value_counts(chunk[column_name]), fill_value=0) \
+                .astype('int64')
+
+    return counts
+
+def count_unique_chunks(chunks, counts, column_names, new_column_names):
+    """Map running counts to a stream of DataFrame chunks.
+
+    Second pass of out-of-core frequency encoding: expand each chunk with the
+    counts computed over the whole stream by 'running_counts', and yield it.
+
+    Arguments:
+        chunks -- iterable of pd.DataFrame.
+        counts -- dict. Output of 'running_counts'.
+        column_names, new_column_names -- As in 'count_unique_columns'.
+    """
+    for chunk in chunks:
+        for column_name, new_column_name in zip(column_names,
+                                                new_column_names):
+            chunk[new_column_name] = gather_counts(chunk[column_name],
+                                                   counts[column_name]).values
+        yield chunk
+
+def spouse_aboard(title, sib_sp, name_count):
+    """Return whether each passenger is travelling with a spouse.
+
+    Shared by 'travels_with_spouse' (a single passenger) and
+    'travels_with_spouse_column' (whole columns).
+
+    Arguments:
+        title, sib_sp, name_count -- scalars or array-likes. Passenger title,
+            number of siblings/spouse onboard the Titanic, and number of
+            occurrences of his/her first name.
+
+    Returns:
+        A boolean np.ndarray, with the same shape as the inputs.
+    """
+    import numpy as np
+
+    return np.isin(title, SPOUSE_TITLES) & (np.asarray(sib_sp) > 0) \
+        & (np.asarray(name_count) == 2)
+
 def travels_with_spouse(df, title, sib_sp, name_count,
                         new_column_name='Spouse Aboard'):
     """Check whether a passenger is travelling with a spouse.
 
+    Row-wise version, to use with DataFrame.apply(axis=1). Prefer the much
+    faster 'travels_with_spouse_column' on large DataFrames.
+
     Arguments:
         df -- pd.DataFrame. The input DataFrame.
         title, sib_sp, name_count -- pd.Series. DataFrame columns containing,
@@ -65,35 +276,113 @@ def travels_with_spouse(df, title, sib_sp, name_count,
     Keyword arguments:
         new_column_name -- str. Title of column to add (default 'Spouse Aboard')
     """
-    import pandas as pd
 
-    if (title in ['Mrs', 'Mr', 'Dr']) & (sib_sp > 0) & (name_count == 2):
-        df[new_column_name] = True
-    else:
-        df[new_column_name] = False
+    df[new_column_name] = bool(spouse_aboard(title, sib_sp, name_count))
 
     return df
 
+def travels_with_spouse_column(df, title_column='Title',
+                               sib_sp_column='Siblings/Spouse Aboard',
+                               name_count_column='Name Count',
+                               new_column_name='Spouse Aboard'):
+    """Check whether passengers are travelling with a spouse.
+
+    Vectorised version of 'travels_with_spouse', applying 'spouse_aboard' to
+    whole columns.
+
+    Arguments:
+        df -- pd.DataFrame. The input DataFrame.
+
+    Keyword arguments:
+        title_column, sib_sp_column, name_count_column -- str. Names of the
+            columns containing passenger title, number of siblings/spouse
+            onboard the Titanic, and number of occurrences of his/her first
+            name (defaults 'Title', 'Siblings/Spouse Aboard', 'Name Count').
+        new_column_name -- str. Title of column to add (default 'Spouse Aboard')
+    """
+
+    df[new_column_name] = spouse_aboard(df[title_column], df[sib_sp_column],
+                                        df[name_count_column])
+
+    return df
+
+# Map rare honorifics to the most similar common one; others are left as is
+TITLE_MAPPING = dict([('Mlle', 'Miss')]
+                     + [(title, 'Mrs') for title in ['the Countess', 'Lady',
+                                                      'Mme', 'Ms']]
+                     + [(title, 'Mr') for title in ['Capt', 'Col', 'Don',
+                                                     'Jonkheer', 'Major',
+                                                     'Master', 'Sir']])
+
 def replace_title(title):
     """Shrink the total number of honorifics in a dataset.
 
+    Scalar version, to use with Series.apply. Prefer 'replace_titles' on large
+    DataFrames.
+
     Arguments:
         title -- str. The honorific to evaluate.
     """
+
+    return TITLE_MAPPING.get(title, title)
+
+def replace_titles(titles):
+    """Shrink the total number of honorifics in a column, as categorical data.
+
+    Vectorised, drop-in version of 'titles.apply(replace_title)'. The column
+    is converted to a categorical dtype, so that each distinct title is looked
+    up in 'TITLE_MAPPING' only once; the integer codes are then remapped to
+    the merged categories. Unseen titles and missing values are left as is.
+
+    Arguments:
+        titles -- pd.Series. The honorifics to evaluate.
+
+    Returns:
+        A categorical pd.Series with the same index and name as 'titles'.
+    """
+    import numpy as np
     import pandas as pd
 
-    if title in ['Mlle']:
-        return 'Miss'
-    elif title in ['the Countess', 'Lady', 'Mme', 'Ms']:
-        return 'Mrs'
-    elif title in ['Capt', 'Col', 'Don', 'Jonkheer', 'Major', 'Master', 'Sir']:
-        return 'Mr'
-    else:
-        return title
+    categorical = titles.astype('category').cat
+
+    # Map each distinct title once, then merge categories mapped together
+    mapped = [TITLE_MAPPING.get(title, title)
+              for title in categorical.categories]
+    categories = sorted(set(mapped))
+    lookup = pd.Index(categories).get_indexer(mapped)
+
+    # Missing values (code -1) stay missing: the last entry maps -1 to -1
+    codes = np.append(lookup, -1)[categorical.codes.values]
+
+    return pd.Series(pd.Categorical.from_codes(codes, categories),
+                     index=titles.index, name=titles.name)
+
+def fill_age(age, mean_age):
+    """Return each age, or 'mean_age' where the age is missing.
+
+    Shared by 'imputed_age' (a single age) and 'imputed_age_column' (a whole
+    column).
+
+    Arguments:
+        age -- int, float or array-like. Age(s) of the passengers, in years.
+        mean_age -- int or float. Average age in the 'Age' column.
+
+    Returns:
+        An np.ndarray of floats, with the same shape as 'age'.
+    """
+    import numpy as np
+
+    age = np.asarray(age, dtype=float)
+
+    # Fill missing spots with average age
+    return np.where(np.isnan(age), mean_age, age)
 
 def imputed_age(df, age, mean_age, new_column_name='Imputed Age'):
     """Replace missing 'Age' values with sample mean and store in a new column.
 
+    Row-wise version, to use with DataFrame.apply(axis=1). Prefer the much
+    faster 'imputed_age_column' on large DataFrames.
+
     Arguments:
         df -- pd.DataFrame. The input DataFrame.
         age -- int or float. The age of the passenger, in years.
@@ -102,26 +391,235 @@ def imputed_age(df, age, mean_age, new_column_name='Imputed Age'):
     Keyword arguments:
         new_column_name -- str. Title of column to add (default 'Imputed Age').
     """
-    import pandas as pd
 
-    # Fill missing spots with average age
-    if pd.isnull(age):
-        df[new_column_name] = mean_age
-    else:
-        df[new_column_name] = age
+    df[new_column_name] = fill_age(age, mean_age)[()]
+
+    return df
+
+def imputed_age_column(df, mean_age, age_column='Age',
+                       new_column_name='Imputed Age'):
+    """Replace missing ages with sample mean and store in a new column.
+
+    Vectorised version of 'imputed_age', applying 'fill_age' to the whole
+    column.
+
+    Arguments:
+        df -- pd.DataFrame. The input DataFrame.
+        mean_age -- int or float. Average age in the 'Age' column.
+
+    Keyword arguments:
+        age_column -- str. Name of the column with passenger ages, in years
+            (default 'Age').
+        new_column_name -- str. Title of column to add (default 'Imputed Age').
+    """
+
+    df[new_column_name] = fill_age(df[age_column], mean_age)
+
+    return df
+
+# Default groups for age imputation
+AGE_GROUPS = ('Title', 'Passenger Class', 'Sex')
+
+def group_imputed_age(df, by=AGE_GROUPS, statistic='mean',
+                      age_column='Age', new_column_name='Imputed Age'):
+    """Replace missing ages with the mean or median age of their group.
+
+    Group-wise extension of 'imputed_age_column': group statistics are
+    computed and broadcast back to the rows in a single groupby-transform
+    pass. Rows whose group has no known age (or whose group keys are missing)
+    are filled with the statistic over the whole column.
+
+    Arguments:
+        df -- pd.DataFrame. The input DataFrame.
+
+    Keyword arguments:
+        by -- str or sequence of str. Columns defining the groups (default
+            AGE_GROUPS, i.e. ('Title', 'Passenger Class', 'Sex')).
+        statistic -- str. Either 'mean' or 'median' (default 'mean').
+        age_column -- str. Name of the column with passenger ages, in years
+            (default 'Age').
+        new_column_name -- str. Title of column to add (default 'Imputed Age').
+    """
+    if statistic not in ('mean', 'median'):
+        raise ValueError("statistic must be either 'mean' or 'median'.")
+
+    by = [by] if isinstance(by, str) else list(by)
+
+    age = df[age_column]
+    group_statistic = df.groupby(by)[age_column].transform(statistic)
+    overall_statistic = getattr(age, statistic)()
+
+    df[new_column_name] = age.fillna(group_statistic).fillna(overall_statistic)
 
     return df
 
+def group_age_statistics(chunks, by=AGE_GROUPS,
+                         statistic='mean', age_column='Age'):
+    """Compute group mean or median ages over a stream of DataFrame chunks.
+
+    First pass of the streaming version of 'group_imputed_age', e.g. over
+    pd.read_csv(..., chunksize=...). Means are accumulated as running sums and
+    counts. Medians are computed exactly from running frequencies of each
+    (group, age) pair, since ages take few distinct values; memory use depends
+    on the number of such pairs, not on the number of rows.
+
+    Arguments:
+        chunks -- iterable of pd.DataFrame.
+
+    Keyword arguments:
+        by, statistic, age_column -- As in 'group_imputed_age'.
+
+    Returns:
+        A tuple (group_statistics, overall_statistic): a pd.Series of group
+        statistics indexed by group keys (always a pd.MultiIndex), and the
+        statistic over all known ages. Input of 'impute_age_chunks'.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if statistic not in ('mean', 'median'):
+        raise ValueError("statistic must be either 'mean' or 'median'.")
+
+    by = [by] if isinstance(by, str) else list(by)
+    frequencies = None
+
+    for chunk in chunks:
+        counts = chunk.groupby(by + [age_column]).size()
+        frequencies = counts if frequencies is None \
+            else frequencies.add(counts, fill_value=0)
+
+    if frequencies is None:
+        return pd.Series(dtype=float), np.nan
+
+    frequencies = frequencies.astype(np.int64)
+    ages = frequencies.index.get_level_values(age_column).values
+    weights = frequencies.values
+
+    def weighted_statistic(ages, weights):
+        if statistic == 'mean':
+            return np.dot(ages, weights) / weights.sum()
+
+        # Median: average of the two middle order statistics (equal if the
+        # number of ages is odd), as in pd.Series.median
+        order = np.argsort(ages)
+        ages, cumulative = ages[order], np.cumsum(weights[order])
+        middle = [(cumulative[-1] - 1) // 2, cumulative[-1] // 2]
+        return ages[np.searchsorted(cumulative, middle, side='right')].mean()
+
+    group_levels = list(range(len(by)))
+    group_statistics = frequencies.groupby(level=group_levels).apply(
+        lambda group: weighted_statistic(
+            group.index.get_level_values(age_column).values, group.values))
+    if not isinstance(group_statistics.index, pd.MultiIndex):
+        group_statistics.index = pd.MultiIndex.from_arrays(
+            [group_statistics.index], names=by)
+
+    return group_statistics, weighted_statistic(ages, weights)
+
+def impute_age_chunks(chunks, group_statistics, overall_statistic,
+                      by=AGE_GROUPS, age_column='Age',
+                      new_column_name='Imputed Age'):
+    """Fill missing ages in a stream of DataFrame chunks with group statistics.
+
+    Second pass of the streaming version of 'group_imputed_age'. Each chunk
+    is imputed as soon as it is read, then yielded, so the whole file never
+    needs to be in memory.
+
+    Arguments:
+        chunks -- iterable of pd.DataFrame.
+        group_statistics, overall_statistic -- Output of
+            'group_age_statistics'.
+
+    Keyword arguments:
+        by, age_column, new_column_name -- As in 'group_imputed_age'.
+    """
+    import pandas as pd
+
+    by = [by] if isinstance(by, str) else list(by)
+
+    for chunk in chunks:
+        keys = pd.MultiIndex.from_frame(chunk[by])
+        fill = pd.Series(group_statistics.reindex(keys).values,
+                         index=chunk.index)
+
+        chunk[new_column_name] = chunk[age_column].fillna(fill) \
+            .fillna(overall_statistic)
+
+        yield chunk
+
+def impute_age_csv(file_path, by=AGE_GROUPS, statistic='mean',
+                   age_column='Age', new_column_name='Imputed Age',
+                   chunksize=100000, **read_csv_kwargs):
+    """Impute missing ages in a large csv file, reading it twice in chunks.
+
+    Run 'group_age_statistics' over a first chunked read of the file, then
+    yield the chunks of a second read imputed with 'impute_age_chunks'. The
+    group columns must already be in the file.
+
+    Arguments:
+        file_path -- str. Path to the csv file.
+
+    Keyword arguments:
+        by, statistic, age_column, new_column_name -- As in
+            'group_imputed_age'.
+        chunksize -- int. Number of rows per chunk (default 100000).
+        read_csv_kwargs -- Additional keyword arguments for pd.read_csv.
+    """
+    import pandas as pd
+
+    group_statistics, overall_statistic = group_age_statistics(
+        pd.read_csv(file_path, chunksize=chunksize, **read_csv_kwargs), by,
+        statistic, age_column)
+
+    for chunk in impute_age_chunks(pd.read_csv(file_path, chunksize=chunksize,
+                                               **read_csv_kwargs),
+                                   group_statistics, overall_statistic, by,
+                                   age_column, new_column_name):
+        yield chunk
+
+# Results of 'association', keyed on column names, options and a fingerprint
+# of the column data; least recently used entries are evicted first
+ASSOCIATION_CACHE_SIZE = 128
+association_cache = OrderedDict()
+association_cache_stats = {'hits': 0, 'misses': 0}
+
+def fingerprint(df, columns):
+    """Return a cheap fingerprint of the data in some DataFrame columns.
+
+    Hash each row of the selected columns and sum the hashes. The sum does not
+    depend on row order, like a contingency table, but changes (with
+    overwhelming probability) whenever any pair of values changes.
+
+    Arguments:
+        df -- pd.DataFrame. The input DataFrame.
+        columns -- list of str. The columns to fingerprint.
+    """
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(df[columns], index=False)
+
+    return (len(df), tuple(str(dtype) for dtype in df[columns].dtypes),
+            int(hashes.sum()))
+
+def clear_association_cache():
+    """Empty the cache of 'association' and reset its hit/miss counters."""
+    association_cache.clear()
+    association_cache_stats.update(hits=0, misses=0)
+
 def association(x, y, df, yates_correction=False, bias_correction=False):
-    """Print phi coefficient, Cramér V and Pearson's independence test result.
+    """Compute phi coefficient, Cramér V and Pearson's independence test result.
 
-    For two columns of a Pandas' DataFrame, print:
+    For two columns of a Pandas' DataFrame, compute:
     - phi coefficient (2 x 2 contingency tables only); apply Yates' correction
       if sample is small;
     - Cramér's V (n x 2 contingency tables, with n > 1);
     - the result of Pearson's test of independence (chi-squared test statistic,
       p-value, theoretical distribution)
 
+    Results are cached, keyed on the column names, the options, and a
+    fingerprint of the column data, so repeated queries on unchanged data are
+    served without recomputing. Use 'print_association' to display them.
+
     Arguments:
         x, y -- str. Pandas' DataFrame column names.
         df -- pd.DataFrame. The input DataFrame.
@@ -132,60 +630,371 @@ def association(x, y, df, yates_correction=False, bias_correction=False):
             an expected count < 5 (default False).
         bias_correction -- bool. If True, apply bias correction to calculate
             Cramér's V (default False).
+
+    Returns:
+        A dictionary with keys 'x', 'y', 'bias_correction', 'categories' (row
+        labels of the contingency table), 'phi' (None unless the table is
+        2 x 2), 'cramers_v', 'chi2', 'p_value', 'dof' and 'expected' (the
+        theoretical distribution, a pd.DataFrame). All are computed on the
+        contingency table without margins, by 'contingency_statistics'. The
+        dictionary is a copy: modifying it does not alter the cache.
     """
+    key = (x, y, yates_correction, bias_correction, fingerprint(df, [x, y]))
+
+    if key in association_cache:
+        association_cache.move_to_end(key)
+        association_cache_stats['hits'] += 1
+        return copy_association(association_cache[key])
+
+    association_cache_stats['misses'] += 1
+    result = compute_association(x, y, df, yates_correction, bias_correction)
+
+    association_cache[key] = result
+    if len(association_cache) > ASSOCIATION_CACHE_SIZE:
+        association_cache.popitem(last=False)
+
+    return copy_association(result)
+
+def compute_association(x, y, df, yates_correction=False,
+                        bias_correction=False):
+    """Compute the result of 'association', bypassing the cache."""
     import numpy as np
-    import scipy as sp
     import pandas as pd
 
-    # Compute contingency table and store values in NumPy 2-D array
-    tab = pd.crosstab(df[x], df[y], margins=True)
+    # Compute contingency table (marginals excluded) and store values in a
+    # NumPy 2-D array
+    tab = pd.crosstab(df[x], df[y])
     n = tab.values
 
-    # Store the dimensions of the contingency table and the total sample size
-    n_rows, n_cols = n.shape
-    N = n[-1, -1]
+    phi, V, chi2, p, dof = contingency_statistics(n, yates_correction,
+                                                  bias_correction)
+
+    # Theoretical distribution under independence
+    ex = np.outer(n.sum(axis=1), n.sum(axis=0)) / n.sum()
+
+    return {'x': x, 'y': y, 'bias_correction': bias_correction,
+            'categories': list(tab.index),
+            'phi': phi if n.shape == (2, 2) else None, 'cramers_v': V,
+            'chi2': chi2, 'p_value': p, 'dof': dof,
+            'expected': pd.DataFrame(ex, index=list(tab.index),
+                                     columns=list(tab.columns))}
+
+def copy_association(result):
+    """Return a copy of an 'association' result, safe to modify."""
+    return dict(result, categories=list(result['categories']),
+                expected=result['expected'].copy())
 
-    # Calculate phi coefficient iff the shape of the contingency table
-    # (marginals excluded) is 2 x 2
-    if (n_rows - 1, n_cols - 1) == (2, 2):
-        phi = (n[1, 1] * n[0, 0] - (n[1, 0] * n[0, 1])) / \
-                np.sqrt(n[-1, 0] * n[-1, 1] * n[0, -1] * n[1, -1])
+def print_association(result):
+    """Print the output of 'association' in a user-friendly format.
 
+    Arguments:
+        result -- dict. Output of the function 'association'.
+    """
+    x, y = result['x'], result['y']
+
+    if result['phi'] is not None:
         print("Phi coefficient for binary variables '{}' == '{}' and '{}': \
-{:.4f}".format(x, tab.index[0], y, -phi))
+{:.4f}".format(x, result['categories'][0], y, -result['phi']))
         print("Phi coefficient for binary variables '{}' == '{}' and '{}': \
-{:.4f}\n".format(x, tab.index[1], y, phi))
+{:.4f}\n".format(x, result['categories'][1], y, result['phi']))
+
+    if result['bias_correction']:
+        print("Cramér's V for variables '{}' and '{}' (Bias-Corrected): \
+{:.4f}".format(x, y, result['cramers_v']))
+    else:
+        print("Cramér's V for variables '{}' and '{}' (No Bias Correction): \
+{:.4f}".format(x, y, result['cramers_v']))
+
+    print("\nPearson's chi-squared test of independence:")
+    print('Test statistic: {:.2f}'.format(result['chi2']))
+    print('p-value: {:.4e}'.format(result['p_value']))
+    print('Theoretical distribution:\n{}'.format(result['expected']))
+
+def contingency_statistics(table, yates_correction=False,
+                           bias_correction=False):
+    """Compute phi, Cramér's V and Pearson's test from a contingency table.
+
+    Same measures as 'association', computed in a single pass over the table:
+    the expected counts are derived once and shared by Cramér's V and the
+    chi-squared test.
+
+    Arguments:
+        table -- np.ndarray. Contingency table without margins, with no empty
+            row or column.
 
-    # Use open multi-dimensional meshgrid to avoid for loops
-    i, j = np.ogrid[range(n_rows - 1), range(n_cols - 1)]
+    Keyword arguments:
+        yates_correction, bias_correction -- bool. As in 'association'.
+
+    Returns:
+        A tuple (phi, cramers_v, chi2, p_value, dof). phi is NaN unless the
+        table is 2 x 2.
+    """
+    import numpy as np
+    from scipy import stats
+
+    n_rows, n_cols = table.shape
+    rows, cols = table.sum(axis=1), table.sum(axis=0)
+    N = rows.sum()
 
-    # Compute chi-squared statistic
-    chi_squared = np.sum((n[i, j] - (n[i, -1] * n[-1, j]) / N) ** 2 / \
-        ((n[i, -1] * n[-1, j]) / N))
+    # Calculate phi coefficient iff the table is 2 x 2
+    phi = np.nan
+    if (n_rows, n_cols) == (2, 2):
+        phi = (table[1, 1] * table[0, 0] - table[1, 0] * table[0, 1]) / \
+            np.sqrt(cols[0] * cols[1] * rows[0] * rows[1])
 
-    # If True, calculate bias-corrected version of Cramér's V
+    expected = np.outer(rows, cols) / N
+    deviations = table - expected
+    chi_squared = np.sum(deviations ** 2 / expected)
+
+    # Cramér's V, with the same (bias-corrected) formulas as 'association'
     if bias_correction:
-        phi_squared = np.max([chi_squared / N \
-            - (n_cols - 1) * (n_rows - 1) / (N - 1), 0])
-        V = np.sqrt(phi_squared / np.min([n_cols - (n_cols - 2) ** 2 / \
-            (N - 1) - 2, n_rows - (n_rows - 2) ** 2 / (N - 1) - 2]))
-        print("Cramér's V for variables '{}' and '{}' (Bias-Corrected): \
-{:.4f}".format(x, y, V))
+        phi_squared = max(chi_squared / N - n_cols * n_rows / (N - 1), 0)
+        V = np.sqrt(phi_squared / min(n_cols - 1 - (n_cols - 1) ** 2 / (N - 1),
+                                      n_rows - 1 - (n_rows - 1) ** 2 / (N - 1)))
+    else:
+        V = np.sqrt(chi_squared / N / min(n_cols - 1, n_rows - 1))
+
+    # Pearson's test of independence, with Yates' correction for continuity
+    # on 1 degree of freedom, as in scipy.stats.chi2_contingency
+    dof = (n_rows - 1) * (n_cols - 1)
+    chi2 = chi_squared
+    if yates_correction and dof == 1:
+        shift = np.minimum(0.5, np.abs(deviations))
+        chi2 = np.sum((np.abs(deviations) - shift) ** 2 / expected)
+    p = stats.chi2.sf(chi2, dof) if dof > 0 else 1.
 
+    return phi, V, chi2, p, dof
+
+def pair_association(args):
+    """Compute the association between two factorised columns.
+
+    Worker function of 'associations'.
+
+    Arguments:
+        args -- tuple. (x, y, x_codes, y_codes, n_x, n_y, yates_correction,
+            bias_correction), with codes output of pd.factorize (-1 for NaN)
+            and n_x, n_y the number of categories.
+    """
+    import numpy as np
+
+    x, y, x_codes, y_codes, n_x, n_y, yates_correction, bias_correction = args
+
+    # Drop rows with a missing value in either column, as pd.crosstab does
+    mask = (x_codes >= 0) & (y_codes >= 0)
+    table = np.bincount(x_codes[mask] * n_y + y_codes[mask],
+                        minlength=n_x * n_y).reshape(n_x, n_y)
+
+    # Drop categories not observed in the remaining rows
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+
+    return (x, y, table.sum()) + contingency_statistics(table,
+        yates_correction, bias_correction)
+
+def associations(df, columns=None, yates_correction=False,
+                 bias_correction=False, processes=None):
+    """Compute association measures for every pair of categorical columns.
+
+    Batch version of 'association'. Each column is factorised once; the
+    contingency table of each pair is then built with np.bincount on the
+    combined integer codes, instead of pd.crosstab.
+
+    Arguments:
+        df -- pd.DataFrame. The input DataFrame.
+
+    Keyword arguments:
+        columns -- list of str. Columns to screen (default None, all columns).
+        yates_correction, bias_correction -- bool. As in 'association'.
+        processes -- int. If larger than 1, spread the pairs over a pool of
+            worker processes (default None, no multiprocessing).
+
+    Returns:
+        A pd.DataFrame with one row per pair of columns (x, y) and columns
+        'x', 'y', 'n', 'phi', 'cramers_v', 'chi2', 'p_value', 'dof'.
+    """
+    import itertools
+    import pandas as pd
+
+    if columns is None:
+        columns = list(df.columns)
+
+    # Sorted categories, as in the rows and columns of pd.crosstab
+    factorised = {}
+    for column in columns:
+        codes, uniques = pd.factorize(df[column], sort=True)
+        factorised[column] = (codes, len(uniques))
+
+    tasks = [(x, y, factorised[x][0], factorised[y][0], factorised[x][1],
+              factorised[y][1], yates_correction, bias_correction)
+             for x, y in itertools.combinations(columns, 2)]
+
+    if processes is not None and processes > 1:
+        from multiprocessing import Pool
+        with Pool(processes) as pool:
+            results = pool.map(pair_association, tasks)
     else:
-        phi_squared = chi_squared / N
-        V = np.sqrt(phi_squared / np.min([n_cols - 2, n_rows - 2]))
-        print("Cramér's V for variables '{}' and '{}' (No Bias Correction): \
-{:.4f}".format(x, y, V))
+        results = [pair_association(task) for task in tasks]
+
+    return pd.DataFrame(results, columns=['x', 'y', 'n', 'phi', 'cramers_v',
+                                          'chi2', 'p_value', 'dof'])
+
+# Default (column name, new column name) pairs expanded with occurrence counts
+COUNT_COLUMNS = (('Cabin', 'Shared Room'),
+                 ('Ticket No.', 'Shared Ticket'),
+                 ('First/Married Name', 'Name Count'))
+
+def transform_chunks(chunks, counts, group_statistics, overall_statistic,
+                     title_column='Title', count_columns=COUNT_COLUMNS,
+                     name_count_column='Name Count',
+                     sib_sp_column='Siblings/Spouse Aboard',
+                     age_by=AGE_GROUPS, age_column='Age'):
+    """Apply the p2 feature transforms to a stream of DataFrame chunks.
+
+    For each chunk, in order: shrink honorifics ('replace_titles'), map the
+    occurrence counts of 'count_columns' ('count_unique_chunks'), detect
+    spouses aboard ('travels_with_spouse_column'), impute missing ages with
+    group statistics ('impute_age_chunks') and label minors and adults
+    ('age_of_majority_column'). Global statistics come from a previous pass,
+    see 'feature_pipeline'.
 
-    # Pearson's test of independence
-    # Return chi-squared test statistic, p-value, and theoretical distribution
-    chi2, p, df, ex = sp.stats.chi2_contingency(n,
-        correction=yates_correction)
+    Arguments:
+        chunks -- iterable of pd.DataFrame.
+        counts -- dict. Output of 'running_counts' for 'count_columns'.
+        group_statistics, overall_statistic -- Output of
+            'group_age_statistics'.
 
-    print("\nPearson's chi-squared test of independence:")
-    print('Test statistic: {:.2f}'.format(chi2))
-    print('p-value: {:.4e}'.format(p))
-    print('Theoretical distribution:\n{}'.format(pd.DataFrame(ex, \
-        index=[tab.index[i] for i in range(n_rows)],
-        columns=[tab.columns[i] for i in range(n_cols)])))
+    Keyword arguments:
+        title_column -- str. Column of honorifics (default 'Title').
+        count_columns -- dict or sequence of pairs. (column name, new column
+            name) pairs to expand with occurrence counts (default
+            COUNT_COLUMNS).
+        name_count_column -- str. New column of first name counts, used to
+            detect spouses; must be one of the new column names in
+            'count_columns' (default 'Name Count').
+        sib_sp_column -- str. Column of siblings/spouse aboard (default
+            'Siblings/Spouse Aboard').
+        age_by -- sequence of str. Groups for age imputation (default
+            AGE_GROUPS, i.e. ('Title', 'Passenger Class', 'Sex')).
+        age_column -- str. Column of ages (default 'Age').
+    """
+    count_columns = dict(count_columns)
+    if name_count_column not in count_columns.values():
+        raise ValueError("name_count_column '{}' is not a new column name in "
+                         "count_columns.".format(name_count_column))
+
+    for chunk in chunks:
+        chunk[title_column] = replace_titles(chunk[title_column])
+
+        chunk, = count_unique_chunks([chunk], counts, list(count_columns),
+                                     list(count_columns.values()))
+        travels_with_spouse_column(chunk, title_column, sib_sp_column,
+                                   name_count_column)
+
+        chunk, = impute_age_chunks([chunk], group_statistics,
+                                   overall_statistic, age_by, age_column)
+        age_of_majority_column(chunk, age_column)
+
+        yield chunk
+
+def feature_pipeline(file_path, output_path, chunksize=100000,
+                     title_column='Title', count_columns=COUNT_COLUMNS,
+                     name_count_column='Name Count',
+                     sib_sp_column='Siblings/Spouse Aboard',
+                     age_by=AGE_GROUPS, age_statistic='mean',
+                     age_column='Age', output_format=None, **read_csv_kwargs):
+    """Run the p2 feature transforms out of core, from csv to csv or Parquet.
+
+    Read the input csv file twice in chunks of 'chunksize' rows. The first
+    pass collects the global statistics the transforms need: occurrence
+    counts ('running_counts') and group ages ('group_age_statistics', on
+    shrunk honorifics). The second pass transforms each chunk with
+    'transform_chunks' and appends it to the output file, so peak memory is
+    bounded by the chunk size plus the (small) global statistics.
+
+    Arguments:
+        file_path -- str. Path to the input csv file. It must already contain
+            the title, name and ticket columns used by the transforms, with
+            the renamed columns of the project (e.g. 'Passenger Class', not
+            'Pclass').
+        output_path -- str. Path to the output file, overwritten if present.
+
+    Keyword arguments:
+        chunksize -- int. Number of rows per chunk (default 100000).
+        title_column, count_columns, name_count_column, sib_sp_column, age_by,
+            age_column -- As in 'transform_chunks'.
+        age_statistic -- str. Either 'mean' or 'median' (default 'mean').
+        output_format -- str. Either 'csv' or 'parquet'. If None, inferred from
+            the extension of 'output_path' (default None). Parquet requires
+            pyarrow; pin column dtypes with 'dtype' in 'read_csv_kwargs' so
+            that all chunks share the schema of the first one.
+        read_csv_kwargs -- Additional keyword arguments for pd.read_csv.
+
+    Returns:
+        The number of rows written.
+    """
+    import os
+    import pandas as pd
+
+    if output_format is None:
+        output_format = 'parquet' if output_path.endswith('.parquet') \
+            else 'csv'
+
+    count_columns = dict(count_columns)
+
+    def read_chunks():
+        return pd.read_csv(file_path, chunksize=chunksize, **read_csv_kwargs)
+
+    # First pass: global statistics. Occurrence counts are updated as each
+    # chunk goes through to the group age statistics, on shrunk honorifics
+    counts = {column_name: pd.Series(dtype='int64')
+              for column_name in count_columns}
+
+    def first_pass():
+        for chunk in read_chunks():
+            running_counts([chunk], list(count_columns), counts)
+            chunk[title_column] = replace_titles(chunk[title_column])
+            yield chunk
+
+    group_statistics, overall_statistic = group_age_statistics(
+        first_pass(), age_by, age_statistic, age_column)
+
+    # Second pass: transform and write each chunk
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    n_rows, writer = 0, None
+    try:
+        for chunk in transform_chunks(read_chunks(), counts, group_statistics,
+                                      overall_statistic, title_column,
+                                      count_columns, name_count_column,
+                                      sib_sp_column, age_by, age_column):
+
+            # Categories may differ between chunks; write plain values
+            chunk[title_column] = chunk[title_column].astype(object)
+
+            if output_format == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                # Counts are float in chunks with missing values; use a
+                # nullable integer type, so that all chunks share one schema
+                for new_column_name in count_columns.values():
+                    chunk[new_column_name] = \
+                        chunk[new_column_name].astype('Int64')
+
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema,
+                                                 preserve_index=False)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(output_path, mode='a', header=n_rows == 0,
+                             index=False)
+
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return n_rows
@@ -266,7 +266,24 @@ cuisine_re = re.compile(r'^(?!.*(' + expected_cuisines_re + ')$).*',
 
 
 # Define auxiliary functions
-def audit_feature(features, tag_value, compiled_re, expected=None):
+def add_sample(features, feature, tag_value, max_samples=None):
+    """Add a tag value to the samples of a feature, up to 'max_samples'.
+
+    Arguments:
+        features -- dict. The dictionary to store problematic data.
+        feature -- str. The matched (problematic) feature.
+        tag_value -- str. Tag value related to key 'addr:<tag>'.
+
+    Keyword arguments:
+        max_samples -- int. Maximum number of distinct values stored for each
+            feature, or None for no limit (default None).
+    """
+    samples = features[feature]
+    if max_samples is None or len(samples) < max_samples:
+        samples.add(tag_value)
+
+def audit_feature(features, tag_value, compiled_re, expected=None,
+                  max_samples=None):
     """Add data not conforming to specified criteria to a dictionary.
 
     This function generalises: 'audit_street_type' [1].
@@ -278,6 +295,8 @@ def audit_feature(features, tag_value, compiled_re, expected=None):
 
     Keyword arguments:
         expected -- list or set. Expected data features (default None).
+        max_samples -- int. Maximum number of values stored for each feature,
+            or None for no limit (default None).
 
     Returns:
         A defaultdict augmented if and only if the entry matches any of the
@@ -288,9 +307,9 @@ def audit_feature(features, tag_value, compiled_re, expected=None):
         feature = match.group()
         if expected != None:
             if feature not in expected:
-                features[feature].add(tag_value)
+                add_sample(features, feature, tag_value, max_samples)
         else:
-            features[feature].add(tag_value)
+            add_sample(features, feature, tag_value, max_samples)
 
 # Store variables to be used as arguments in 'audit_feature'
 re_library = [street_type_re,
@@ -303,14 +322,91 @@ re_library = [street_type_re,
               city_name_re,
               cuisine_re]
 
-def audit(OSM_FILE, re_library):
+"""Necessary conditions for each pattern in 're_library' to match: cheap regular
+expressions which, if not found in a value, rule out the full (and possibly
+expensive) search, e.g. a street number must end the name for
+'number_in_street_re' to match. None if no such prefilter is useful.
+"""
+prefilters = [None,          # street_type_re
+              r'\d',         # additional_road_types_re
+              r'\d',         # date_in_street_re
+              r'\.',         # abbreviations_re
+              r"l'\s",       # apostrophes_re
+              r'\s\d+$',     # number_in_street_re
+              None,          # postcode_re
+              None,          # city_name_re
+              None]          # cuisine_re
+
+def combine_patterns(patterns, prefilters=None):
+    """Compile a list of regular expressions into a single multi-pattern one.
+
+    Each pattern becomes an optional lookahead, preceded by a lazy '.*?' and
+    wrapped in a named group 'g<i>' with the pattern's own flags. Matching the
+    combined expression at the start of a string therefore finds, for each
+    pattern, the same leftmost match as pattern.search(), in a single call.
+    A pattern is only tried if its prefilter, if any, is found first.
+
+    Arguments:
+        patterns -- list of _sre.SRE_Pattern. Compiled regular expressions.
+
+    Keyword arguments:
+        prefilters -- list of str. Necessary conditions for each pattern to
+            match, or None (default None, no prefilters).
+
+    Returns:
+        A compiled regular expression, input of 'match_patterns'.
+    """
+    if prefilters is None:
+        prefilters = [None] * len(patterns)
+
+    parts = []
+    for i, (pattern, prefilter) in enumerate(zip(patterns, prefilters)):
+        flags = ''.join(flag for flag, value in [('i', re.IGNORECASE),
+                                                 ('x', re.VERBOSE)]
+                        if pattern.flags & value)
+
+        # End verbose patterns with a newline, so that a trailing comment does
+        # not swallow the closing bracket
+        inner = '(?{}:{}\n)'.format(flags, pattern.pattern) if 'x' in flags \
+            else '(?{}:{})'.format(flags, pattern.pattern)
+        guard = '(?=(?s:.*?){})'.format(prefilter) if prefilter else ''
+        parts.append('(?:{}(?=(?s:.*?)(?P<g{}>{}))|)'.format(guard, i, inner))
+
+    return re.compile(''.join(parts))
+
+# Names of the groups holding the match of each pattern in 'combine_patterns'
+group_names = ['g{}'.format(i) for i in range(len(re_library))]
+
+def match_patterns(combined_re, tag_value):
+    """Return the match of each pattern in a combined regular expression.
+
+    Arguments:
+        combined_re -- _sre.SRE_Pattern. Output of 'combine_patterns'.
+        tag_value -- str. The value to search.
+
+    Returns:
+        A list with, for each pattern, the matched substring (as in
+        pattern.search(tag_value).group()) or None if there is no match.
+    """
+    groups = combined_re.match(tag_value).groupdict()
+    return [groups[name] for name in group_names[:len(groups)]]
+
+def audit(OSM_FILE, re_library, max_samples=None):
     """Fill an empty dictionary with entries matching regular expressions.
 
+    The file is streamed: each top level element is audited once fully
+    parsed (on its 'end' event) and then cleared, so that memory does not
+    grow with the size of the document.
+
     Arguments:
         OSM_FILE -- str. Name of the OSM file to audit, including extension.
         re_library -- (list of) _sre.SRE_Pattern. Single regular expression
             or list of regular expressions.
 
+    Keyword arguments:
+        max_samples -- int. Maximum number of distinct values stored for each
+            feature, or None to keep them all (default None).
+
     Returns:
         A modified 'features' dictionary containing the matched key and a
         dictionary of associated values in the dataset. For example:
@@ -333,20 +429,31 @@ def audit(OSM_FILE, re_library):
                 None,
                 expected_cuisines]
 
-    for event, elem in ET.iterparse(OSM_FILE, events=('start',)):
+    # Search all street patterns at once, with a single combined expression
+    street_re = combine_patterns(re_library[:len(re_library) - 2],
+                                 prefilters[:len(re_library) - 2])
+
+    context = ET.iterparse(OSM_FILE, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end':
+            continue
+
         if (elem.tag == 'node') | (elem.tag == 'way'):
             for tag in elem.iter('tag'):
 
                 # Audit street features
                 if is_street_name(tag):
 
-                    """Update defaultdict with problematic street features.
-                    Use list comprehension to pack all queries in a single
-                    line of code.
+                    """Update defaultdict with problematic street features,
+                    as 'audit_feature' would for each pattern separately.
                     """
-                    [audit_feature(street_features, tag.attrib['v'],
-                                  re_library[i], expected[i]) for i \
-                                  in range(len(re_library) - 2)]
+                    matches = match_patterns(street_re, tag.attrib['v'])
+                    for feature, expected_values in zip(matches, expected):
+                        if feature is not None and (expected_values is None \
+                           or feature not in expected_values):
+                            add_sample(street_features, feature,
+                                       tag.attrib['v'], max_samples)
 
                 # Audit postcode features
                 elif is_postcode(tag):
@@ -354,16 +461,20 @@ def audit(OSM_FILE, re_library):
                     with 20, add code to defaultdict.
                     """
                     audit_feature(postcode_features, tag.attrib['v'],
-                                  postcode_re, None)
+                                  postcode_re, None, max_samples)
 
                 # Audit city features
                 elif is_city_name(tag):
                     audit_feature(city_features, tag.attrib['v'],
-                                  city_name_re, None)
+                                  city_name_re, None, max_samples)
 
                 # Audit cuisine features
                 elif is_cuisine(tag):
                     audit_feature(cuisine_features, tag.attrib['v'],
-                                  cuisine_re, expected_cuisines)
+                                  cuisine_re, expected_cuisines, max_samples)
+
+        # Free the finished top level element, and its children
+        if elem.tag in ('node', 'way', 'relation'):
+            root.clear()
 
     return street_features, postcode_features, city_features, cuisine_features
@@ -0,0 +1,242 @@
+"""Benchmark the performance-sensitive steps of the OSM data wrangling
+pipeline, comparing the original implementations with their faster versions.
+
+Note: Place this script in the same folder as the other modules, together with
+      the OSM sample file. Use Python 3 to run this script.
+
+* Auxiliary module 2 of 3
+
+2017 - Federico Maria Massari / federico.massari@bocconialumni.it
+"""
+
+import os
+import resource
+import timeit
+import xml.etree.cElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import audit
+import clean
+import parsers
+from audit import re_library
+
+filename = 'milan_italy_sample.osm'
+
+
+"""A. STREET PATTERNS
+-------------------------------------------------------------------------------
+Compare one search per pattern in 're_library' with a single search of the
+combined multi-pattern expression ('audit.combine_patterns'), on all the
+'addr:street' values in the OSM file; then the full 'update_name' passes with
+and without the prefilters of 'clean.clean_street_name'.
+"""
+def street_names(osm_file=filename):
+    """Return the list of all 'addr:street' tag values in the OSM file."""
+    return [elem.attrib['v'] for event, elem in ET.iterparse(osm_file)
+            if elem.tag == 'tag' and audit.is_street_name(elem)]
+
+def benchmark_street_patterns(names, repeat=5):
+    """Time per-pattern and combined searches of street features.
+
+    Arguments:
+        names -- list of str. Street names, output of 'street_names'.
+
+    Keyword arguments:
+        repeat -- int. Number of timing runs; the best is kept (default 5).
+
+    Returns:
+        A dictionary of the form {method: seconds per street name}.
+    """
+    patterns = re_library[:len(re_library) - 2]
+    street_re = audit.combine_patterns(patterns,
+                                       audit.prefilters[:len(patterns)])
+
+    def per_pattern():
+        for name in names:
+            [pattern.search(name) for pattern in patterns]
+
+    def combined():
+        for name in names:
+            audit.match_patterns(street_re, name)
+
+    def per_pattern_clean():
+        for name in names:
+            for i in range(len(clean.query_types)):
+                name = clean.update_name(name, re_library[i],
+                                         clean.query_types[i],
+                                         clean.mappings[i])
+
+    def prefiltered_clean():
+        for name in names:
+
+            # Bypass the memo layer, to time the cleaning itself
+            clean.clean_street_name.__wrapped__(name)
+
+    timings = {}
+    for method in [per_pattern, combined, per_pattern_clean,
+                   prefiltered_clean]:
+        best = min(timeit.repeat(method, number=1, repeat=repeat))
+        timings[method.__name__] = best / max(len(names), 1)
+        print('{:>18}: {:6.2f} us per street name'.format(
+            method.__name__, 1e6 * timings[method.__name__]))
+
+    return timings
+
+
+
+"""B. AUDIT MEMORY
+-------------------------------------------------------------------------------
+Audit synthetic OSM files of growing size (the sample file, repeated) in a
+fresh process each, and report how much the audit raises its peak resident
+set size: since 'audit' clears each element once parsed, the growth should not
+depend on the size of the file.
+"""
+SYNTHETIC_FILE = 'synthetic.osm'
+SYNTHETIC_SIZES_MB = [64, 512, 2048]
+
+def synthetic_osm(size_mb, osm_file=filename, synthetic_file=SYNTHETIC_FILE):
+    """Write an OSM file of about 'size_mb' MB by repeating the sample file.
+
+    Returns:
+        The size of the written file, in bytes.
+    """
+    block = ''.join(ET.tostring(elem, encoding='unicode')
+                    for elem in ET.parse(osm_file).getroot())
+    block_size = len(block.encode('utf-8'))
+
+    with open(synthetic_file, 'w', encoding='utf-8') as output:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm>\n')
+        for _ in range(max(1, size_mb * 2**20 // block_size)):
+            output.write(block)
+        output.write('</osm>\n')
+
+    return os.path.getsize(synthetic_file)
+
+def reset_peak_rss():
+    """Reset the peak RSS of the process to its current RSS, and return it.
+
+    On Linux, writing '5' to /proc/self/clear_refs resets the high-water mark
+    (VmHWM), so that the peak measured afterwards is not that reached while
+    importing modules. Elsewhere, fall back to the peak so far (ru_maxrss),
+    which may hide growth below it.
+
+    Returns:
+        The RSS to measure growth from, in kB.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak_rss()
+
+def peak_rss():
+    """Return the peak RSS of the process, in kB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def audit_peak_rss(osm_file, max_samples=None):
+    """Audit the file and return how much the peak RSS of the process grew
+    during the audit, in MB.
+    """
+    baseline = reset_peak_rss()
+    audit.audit(osm_file, re_library, max_samples)
+
+    return (peak_rss() - baseline) / 1024
+
+def benchmark_audit_memory(sizes_mb=SYNTHETIC_SIZES_MB, max_samples=100,
+                           synthetic_file=SYNTHETIC_FILE):
+    """Report the peak RSS of 'audit' on synthetic files of growing size.
+
+    Keyword arguments:
+        sizes_mb -- list of int. Approximate sizes of the synthetic files.
+        max_samples -- int. Cap on the values stored per feature (default 100).
+        synthetic_file -- str. Path of the synthetic file, removed at the end.
+
+    Returns:
+        A dictionary of the form {file size in MB: peak RSS growth in MB}.
+    """
+    peaks = {}
+    try:
+        for size_mb in sizes_mb:
+            file_mb = synthetic_osm(size_mb, synthetic_file=synthetic_file) \
+                / 2**20
+
+            # Spawn a fresh interpreter, so that the peak is the audit's own
+            with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as ex:
+                peaks[file_mb] = ex.submit(audit_peak_rss, synthetic_file,
+                                           max_samples).result()
+            print('{:>10.0f} MB file: +{:.1f} MB peak RSS'.format(
+                file_mb, peaks[file_mb]))
+    finally:
+        if os.path.exists(synthetic_file):
+            os.remove(synthetic_file)
+
+    return peaks
+
+
+"""C. PARSER BACKENDS
+-------------------------------------------------------------------------------
+Stream all top level elements of the OSM file with each 'parsers' backend, in
+a fresh process, and report throughput and how much parsing raises the peak
+resident set size, measured from a reset high-water mark ('reset_peak_rss').
+"""
+def parse_elements(osm_file, backend):
+    """Parse the file, touching every child of every top level element.
+
+    Returns:
+        A tuple (number of elements, seconds, growth of the peak RSS in MB).
+    """
+    baseline = reset_peak_rss()
+    start = timeit.default_timer()
+    count = 0
+    for element in parsers.get_element(osm_file, backend=backend):
+        count += 1
+        for child in element:
+            child.attrib
+    seconds = timeit.default_timer() - start
+
+    return count, seconds, (peak_rss() - baseline) / 1024
+
+def benchmark_parsers(osm_file=filename, backends=('etree', 'lxml', 'expat')):
+    """Compare elements per second and peak RSS of the parser backends.
+
+    Keyword arguments:
+        osm_file -- str. The OSM file to parse (default the sample file).
+        backends -- tuple of str. Backends to compare, see parsers.BACKENDS.
+
+    Returns:
+        A dictionary of the form {backend: (elements per second, peak RSS
+        growth in MB)}.
+    """
+    results = {}
+    for backend in backends:
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as ex:
+            count, seconds, peak = ex.submit(parse_elements, osm_file,
+                                             backend).result()
+        results[backend] = (count / seconds, peak)
+        print('{:>10}: {:10,.0f} elements/s, +{:.1f} MB peak RSS'.format(
+            backend, *results[backend]))
+
+    return results
+
+if __name__ == '__main__':
+    names = street_names()
+    print('\nSTREET PATTERNS ({} street names):'.format(len(names)))
+    benchmark_street_patterns(names)
+
+    print('\nAUDIT MEMORY (max. 100 samples per feature):')
+    benchmark_audit_memory()
+
+    print('\nPARSER BACKENDS:')
+    benchmark_parsers()
@@ -14,6 +14,8 @@ References
 """
 
 # Import required modules
+from functools import lru_cache
+import re
 import audit
 from audit import re_library
 
@@ -350,7 +352,70 @@ def update_cuisine(cuisine, re_query):
 
     return better_cuisine
 
-"""(6) TESTING
+"""(6) MEMOIZED CLEANING
+
+The same tag values (street names above all) recur across thousands of
+elements in the OSM file. Wrap each cleaning chain in a bounded least recently
+used (LRU) cache keyed on the raw value, so that each distinct value is
+cleaned only once. Use 'cache_info' to check the hit rate of each cache.
+"""
+CACHE_SIZE = 100000
+
+# Prefilters of the street patterns, to skip passes that cannot match
+street_prefilters = [re.compile(prefilter) if prefilter else None
+                     for prefilter in audit.prefilters[:len(query_types)]]
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_street_name(name):
+    """Apply all 'update_name' passes, in 'query_types' order, to a street.
+
+    Passes whose prefilter (see 'audit.prefilters') is not found in the name
+    cannot match, leave it unchanged and are skipped.
+    """
+    for i in range(len(query_types)):
+        prefilter = street_prefilters[i]
+        if prefilter is not None and not prefilter.search(name):
+            continue
+        name = update_name(name, re_library[i], query_types[i], mappings[i])
+    return name
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_postcode(postcode, re_query=re_library[-3]):
+    """Memoized version of 'update_postcode'."""
+    return update_postcode(postcode, re_query)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_city_name(city_name, re_query=re_library[-2]):
+    """Memoized version of 'update_city_name'."""
+    return update_city_name(city_name, re_query)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_cuisine(cuisine, re_query=re_library[-1]):
+    """Memoized version of 'update_cuisine'."""
+    return update_cuisine(cuisine, re_query)
+
+def cache_info():
+    """Return hits, misses, size and hit rate of each cleaning cache.
+
+    Returns:
+        A dictionary of the form {'street': {'hits': ..., 'misses': ...,
+        'currsize': ..., 'hit_rate': ...}, 'postcode': {...}, ...}.
+    """
+    caches = {'street': clean_street_name,
+              'postcode': clean_postcode,
+              'city': clean_city_name,
+              'cuisine': clean_cuisine}
+
+    info = {}
+    for feature, function in caches.items():
+        hits, misses, _, currsize = function.cache_info()
+        calls = hits + misses
+        info[feature] = {'hits': hits, 'misses': misses, 'currsize': currsize,
+                         'hit_rate': hits / calls if calls else 0.}
+
+    return info
+
+"""(7) TESTING
 
 On Terminal or Command Prompt, run '$ python3 clean.py' to print the output
 of the cleaning procedure.
@@ -399,15 +464,16 @@ def print_library(dictionary, re_library, query_types=None, mappings=None):
                 & (value not in ['meat', 'steak', 'steak_house']):
                 print(value, '->', better_value)
 
-# Comment the remaining lines of code to suppress output
-filename = 'milan_italy_sample.osm'
-street, postcode, city, cuisine = audit.audit(filename, re_library)
-print('\nSTREET FEATURES:')
-print_library(street, re_library, query_types, mappings)
-print('\nPOSTCODE FEATURES:')
-print_library(postcode, re_library)
-print('\nCITY FEATURES:')
-print_library(city, re_library)
-print("\nCUISINE FEATURES:")
-print("NOTE: Multiple tags and generic words cleaned in 'data.py'.")
-print_library(cuisine, re_library)
+# Only print when run as a script, not when imported (e.g. by data.py)
+if __name__ == '__main__':
+    filename = 'milan_italy_sample.osm'
+    street, postcode, city, cuisine = audit.audit(filename, re_library)
+    print('\nSTREET FEATURES:')
+    print_library(street, re_library, query_types, mappings)
+    print('\nPOSTCODE FEATURES:')
+    print_library(postcode, re_library)
+    print('\nCITY FEATURES:')
+    print_library(city, re_library)
+    print("\nCUISINE FEATURES:")
+    print("NOTE: Multiple tags and generic words cleaned in 'data.py'.")
+    print_library(cuisine, re_library)
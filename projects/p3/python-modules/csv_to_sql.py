@@ -18,42 +18,40 @@ References
 2017 - Federico Maria Massari / federico.massari@bocconialumni.it
 """
 
+import os
+import re
 import sqlite3
 import csv
+import time
+import multiprocessing
 import pandas as pd
+from schema import schema
 
-# Store the data in the 'milan_italy.db' file
-sqlite_database = 'milan_italy.db'
+SQL_SCHEMA = 'data_wrangling_schema.sql'
 
-# Create a Connection object that represents the database [1], [2]
-conn = sqlite3.connect(sqlite_database)
-
-# Create a Cursor object, which runs queries and fetches results
-c = conn.cursor()
-
-# Open and read the data wrangling schema to insert into the SQL database
-dw_schema = 'data_wrangling_schema.sql'
-query = open(dw_schema, 'r').read()
-
-"""Import data wrangling schema into the open database. Using .execute() will
-raise 'Warning: You can only execute one statement at a time.' .executescript()
-allows instead to execute multiple SQL statements with one single call [3].
-"""
-c.executescript(query)
+def create_tables(conn, schema_file=SQL_SCHEMA):
+    """Create the tables of the SQL schema which are not yet in the database,
+    e.g. after a direct load by data.py, keeping the existing ones [3].
+    """
+    with open(schema_file, 'r') as f:
+        query = f.read()
+    conn.executescript(re.sub(r'CREATE TABLE\s+', 'CREATE TABLE IF NOT EXISTS ',
+                              query))
 
-"""The database now contains five empty tables accessible via Terminal or
-Command Prompt:
-$ sqlite3 milan_italy.db
-sqlite> .tables                 <- For a list of tables in the database
-sqlite> .schema <tablename>     <- For the schema of individual tables
-"""
+def clear_tables(conn, tables):
+    """Delete all rows of the tables, so that a new import replaces their
+    content instead of appending to it (and failing on the primary keys).
+    """
+    for table in tables:
+        conn.execute('DELETE FROM {};'.format(table))
 
 # Fill database tables with the content of the csv files output of data.py [4]
-def csv_to_sql(csv_file, directory=''):
+def csv_to_sql(conn, csv_file, directory=''):
     """Import the content of a csv file into a SQL database table, whose name
     is specified by the csv filename (without extension).
 
     Arguments:
+        conn -- sqlite3.Connection. The open database.
         csv_file -- str. The full name of the csv file, e.g., 'nodes.csv';
 
     Keyword arguments:
@@ -92,18 +90,303 @@ def csv_to_sql(csv_file, directory=''):
                            e.g. len(fields) = 8 -> '?, '*8 -> '?, ?, ?, ...,
                            ?, ' -> (rstrip) '?, ...., ?'.
     """
-    c.executemany('INSERT INTO {} ({}) VALUES ({});'\
+    conn.executemany('INSERT INTO {} ({}) VALUES ({});'\
                 .format(csv_file.split('.')[0], ', '.join(fields), \
                         ('?, ' * len(fields)).rstrip(', ')), to_db)
 
+def parquet_to_sql(conn, parquet_file, directory=''):
+    """Import a Parquet table written by 'data.write_tables' into the SQL
+    database table of the same name, e.g. 'nodes.parquet' -> 'nodes'.
+
+    Columns are already typed, so rows are inserted batch by batch, with no
+    text parsing. Requires pyarrow.
+
+    Arguments:
+        conn -- sqlite3.Connection. The open database.
+        parquet_file -- str. The full name of the Parquet file.
+
+    Keyword arguments:
+        directory -- str. The folder containing the file. Must include forward
+            slash at the end, e.g. './' (default '').
+
+    Returns:
+        The number of rows imported.
+    """
+    import pyarrow.parquet as pq
+
+    table_file = pq.ParquetFile(directory + parquet_file)
+    fields = table_file.schema_arrow.names
+    statement = insert_statement(parquet_file.split('.')[0], fields)
+
+    rows = 0
+    for batch in table_file.iter_batches():
+        conn.executemany(statement, zip(*batch.to_pydict().values()))
+        rows += batch.num_rows
+
+    return rows
+
+"""Parquet import. With PARQUET = True, the five OSM tables are loaded from the
+typed Parquet files written by data.py with output_format='parquet' (requires
+pyarrow); 'municipalities.csv' is still imported from csv.
+"""
+PARQUET = False
+
+"""Bulk import. Rows are streamed from each csv file in batches of BATCH_SIZE,
+so no file is ever fully held in memory, while SQLite runs without rollback
+journal and without syncing to disk ('BULK_PRAGMAS'). Secondary indexes are
+built once, after all tables are loaded, instead of being updated row by row.
+Note: an interrupted bulk import may leave a corrupt database; run it again
+from scratch.
+"""
+BULK = True
+BATCH_SIZE = 50000
+
+BULK_PRAGMAS = {'journal_mode': 'OFF',
+                'synchronous': 'OFF',
+                'cache_size': -200000}      # Negative: in KiB, i.e. ~200 MB
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE',
+                   'synchronous': 'FULL',
+                   'cache_size': -2000}
+
+SECONDARY_INDEXES = {'nodes_tags_id': 'nodes_tags (id)',
+                     'ways_tags_id': 'ways_tags (id)',
+                     'ways_nodes_id': 'ways_nodes (id)',
+                     'ways_nodes_node_id': 'ways_nodes (node_id)'}
+
+def set_pragmas(conn, pragmas):
+    """Apply a dictionary of SQLite PRAGMA settings to the open database"""
+    for pragma, value in pragmas.items():
+        conn.execute('PRAGMA {} = {};'.format(pragma, value))
+
+def create_indexes(conn, indexes=SECONDARY_INDEXES):
+    """Create the secondary indexes, e.g. on the foreign keys of the tables"""
+    for name, columns in indexes.items():
+        conn.execute('CREATE INDEX IF NOT EXISTS {} ON {};'.format(name,
+                                                                   columns))
+
+def print_rate(label, rows, seconds):
+    """Print the number of rows imported and the rows per second"""
+    print('{:>20}: {:>10,} rows, {:>12,.0f} rows/s'.format(
+        label, rows, rows / seconds if seconds else float('nan')))
+
+def csv_batches(file_path, batch_size=BATCH_SIZE):
+    """Yield the header of a csv file, then lists of up to 'batch_size' rows"""
+    with open(file_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        yield next(reader)
+
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def bulk_csv_to_sql(conn, csv_file, directory='', batch_size=BATCH_SIZE):
+    """Import the content of a csv file into the SQL table of the same name,
+    as 'csv_to_sql', but streaming it in batches of 'batch_size' rows.
+
+    Arguments:
+        conn -- sqlite3.Connection. The open database.
+        csv_file -- str. The full name of the csv file, e.g., 'nodes.csv';
+
+    Keyword arguments:
+        directory -- str. The folder containing the csv file. Must include
+            forward slash at the end, e.g. './' (default '').
+        batch_size -- int. Number of rows per executemany call.
+
+    Returns:
+        The number of rows imported.
+    """
+    batches = csv_batches(directory + csv_file, batch_size)
+    fields = next(batches)
+    statement = insert_statement(csv_file.split('.')[0], fields)
+
+    rows = 0
+    for batch in batches:
+        conn.executemany(statement, batch)
+        rows += len(batch)
+
+    return rows
+
+def insert_statement(table, fields):
+    """Return the prepared INSERT statement of a table, as in 'csv_to_sql'"""
+    return 'INSERT INTO {} ({}) VALUES ({});'.format(
+        table, ', '.join(fields), ', '.join(['?'] * len(fields)))
+
+"""Parallel import. A pool of processes reads the csv files, one file per task,
+and converts the text of integer and float fields with the 'coerce' functions
+of schema.py (e.g. id, lat, lon). Coerced batches are sent through a bounded
+queue to the main process, the only one writing to the database: it inserts
+and commits each batch as it arrives, while the workers keep parsing.
+Sending batches between processes adds work of its own: on a single CPU this
+import was ~1.8X slower than the serial bulk import, which stays the default
+until a speed-up is measured on several cores.
+"""
+PARALLEL = False
+QUEUE_SIZE = 8      # Batches waiting to be written, at most
+
+# Schema entry of each table, in schema.py
+TABLE_SCHEMA = {'nodes': 'node',
+                'nodes_tags': 'node_tags',
+                'ways': 'way',
+                'ways_nodes': 'way_nodes',
+                'ways_tags': 'way_tags'}
+
+def coercions(table, schema=schema):
+    """Return a dictionary {field: coerce function} for a table, e.g. {'id':
+    int, 'lat': float, ...} for 'nodes'; empty if the table is not in schema.
+    """
+    if table not in TABLE_SCHEMA:
+        return {}
+    rules = schema[TABLE_SCHEMA[table]]
+    rules = rules['schema']['schema'] if rules['type'] == 'list' \
+        else rules['schema']
+
+    return {field: rule['coerce'] for field, rule in rules.items()
+            if 'coerce' in rule}
+
+def init_worker(queue, batch_size):
+    """Store the shared queue and the batch size in each worker process"""
+    global worker_queue, worker_batch_size
+    worker_queue = queue
+    worker_batch_size = batch_size
+
+def parse_csv(file_path):
+    """Read a csv file in batches, coerce their fields and put each on the
+    queue as (table, fields, batch). A final (table, None, None) marks the end
+    of the file, even if parsing fails.
+    """
+    table = os.path.basename(file_path).split('.')[0]
+    try:
+        batches = csv_batches(file_path, worker_batch_size)
+        fields = next(batches)
+        coerce = coercions(table)
+        columns = [(i, coerce[field]) for i, field in enumerate(fields)
+                   if field in coerce]
+
+        for batch in batches:
+            for row in batch:
+                for i, function in columns:
+                    row[i] = function(row[i])
+            worker_queue.put((table, fields, batch))
+    finally:
+        worker_queue.put((table, None, None))
+
+def parallel_csv_to_sql(conn, csv_files, directory='', processes=None,
+                        batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+    """Import csv files into the SQL tables of the same name, parsing them in
+    a pool of processes and writing from this process only.
+
+    Arguments:
+        conn -- sqlite3.Connection. The open database.
+        csv_files -- list of str. The full names of the csv files.
+
+    Keyword arguments:
+        directory -- str. The folder containing the csv files. Must include
+            forward slash at the end, e.g. './' (default '').
+        processes -- int. Number of parsing processes (default None, i.e.
+            os.cpu_count()).
+        batch_size -- int. Number of rows per batch.
+        queue_size -- int. Maximum number of batches waiting to be written.
+
+    Returns:
+        A dictionary of the form {table: (number of rows imported, seconds
+        from the start of the import until the table was complete)}.
+    """
+    queue = multiprocessing.Queue(queue_size)
+    rows = {csv_file.split('.')[0]: 0 for csv_file in csv_files}
+    seconds = {}
+    start = time.perf_counter()
+
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(queue, batch_size)) as pool:
+        paths = [directory + csv_file for csv_file in csv_files]
+        result = pool.map_async(parse_csv, paths)
+
+        remaining = len(csv_files)
+        while remaining:
+            table, fields, batch = queue.get()
+            if batch is None:
+                remaining -= 1
+                seconds[table] = time.perf_counter() - start
+                continue
+            conn.executemany(insert_statement(table, fields), batch)
+            conn.commit()
+            rows[table] += len(batch)
+
+        # Raise any exception from the workers
+        result.get()
+
+    return {table: (rows[table], seconds[table]) for table in rows}
+
 # Store filenames and lists of fields into separate lists, for neater code
 directory = './csv/'
 files = ['nodes.csv', 'nodes_tags.csv', 'ways.csv', 'ways_nodes.csv', \
             'ways_tags.csv', 'municipalities.csv']
+parquet_files = [csv_file.split('.')[0] + '.parquet'
+                 for csv_file in files[:-1]]
+
+
+"""Only run the import as a script, so that the parsing processes of the
+parallel import do not open the database too.
+"""
+if __name__ == '__main__':
+    # Store the data in the 'milan_italy.db' file
+    sqlite_database = 'milan_italy.db'
+
+    # Create a Connection object that represents the database [1], [2]
+    conn = sqlite3.connect(sqlite_database)
+
+    """Import data wrangling schema into the open database. Using .execute()
+    will raise 'Warning: You can only execute one statement at a time.'
+    .executescript() allows instead to execute multiple SQL statements with one
+    single call [3]. Tables already in the database are kept, then emptied, so
+    that the script can run again on the same file.
+    """
+    create_tables(conn)
+    clear_tables(conn, [csv_file.split('.')[0] for csv_file in files])
+    conn.commit()
+
+    """The database now contains five empty tables accessible via Terminal or
+    Command Prompt:
+    $ sqlite3 milan_italy.db
+    sqlite> .tables                 <- For a list of tables in the database
+    sqlite> .schema <tablename>     <- For the schema of individual tables
+    """
+
+    # Insert csv content into SQL tables
+    if PARQUET or PARALLEL or BULK:
+        set_pragmas(conn, BULK_PRAGMAS)
+
+        if PARQUET:
+            for table_file in parquet_files + files[-1:]:
+                load = parquet_to_sql if table_file.endswith('.parquet') \
+                    else bulk_csv_to_sql
+                start = time.perf_counter()
+                rows = load(conn, table_file, directory)
+                print_rate(table_file, rows, time.perf_counter() - start)
+        elif PARALLEL:
+            for table, (rows, seconds) in parallel_csv_to_sql(
+                    conn, files, directory).items():
+                print_rate(table + '.csv', rows, seconds)
+        else:
+            for csv_file in files:
+                start = time.perf_counter()
+                rows = bulk_csv_to_sql(conn, csv_file, directory)
+                print_rate(csv_file, rows, time.perf_counter() - start)
+        conn.commit()
 
-# Insert csv content into SQL tables
-[csv_to_sql(files[i], directory) for i in range(len(files))]
+        start = time.perf_counter()
+        create_indexes(conn)
+        print('{:>20}: {:.2f} s'.format('secondary indexes',
+                                        time.perf_counter() - start))
+        set_pragmas(conn, DEFAULT_PRAGMAS)
+    else:
+        [csv_to_sql(conn, files[i], directory) for i in range(len(files))]
 
-# Commit all changes and close the Connection object (i.e. the database)
-conn.commit()
-conn.close()
+    # Commit all changes and close the Connection object (i.e. the database)
+    conn.commit()
+    conn.close()
@@ -38,24 +38,28 @@ References
 """
 
 import os
+import io
 import csv
 import pandas as pd
-import codecs
 import pprint
 import re
-import xml.etree.cElementTree as ET
+import shutil
+import tempfile
+import multiprocessing
 import cerberus
 from schema import schema
+import parsers
 
 # Import custom scripts
 import audit
 import clean
+from csv_to_sql import insert_statement, create_tables, clear_tables
 
-"""Import the list of compiled regular expressions from audit.py, and the lists
-of query_types and mappings from clean.py, all to be used in 'shape_element'.
+"""Import the list of compiled regular expressions from audit.py, to be used in
+'shape_element'. Street names are cleaned with all the query_types and mappings
+of clean.py by 'clean.clean_street_name'.
 """
 from audit import expected_types, re_library
-from clean import query_types, mappings
 
 """A. OPENSTREETMAP DATA
 -------------------------------------------------------------------------------
@@ -88,6 +92,8 @@ NODE_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
 WAY_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_NODES_FIELDS = ['id', 'node_id', 'position']
+FIELDS = [NODE_FIELDS, NODE_TAGS_FIELDS, WAY_FIELDS, WAY_NODES_FIELDS,
+          WAY_TAGS_FIELDS]
 
 """The 'shape_element' function takes as input an iterparse Element object and
 returns a dictionary.
@@ -157,19 +163,17 @@ def shape_element(element, node_attr_fields=NODE_FIELDS,
                     tag values using functions from module clean.py
                     """
                     if tag['key'] == 'street':
-                        for i in range(len(query_types)):
-                            child.attrib['v'] = \
-                            clean.update_name(child.attrib['v'], re_library[i],
-                                              query_types[i], mappings[i])
-                            tag['value'] = child.attrib['v']
+                        child.attrib['v'] = \
+                            clean.clean_street_name(child.attrib['v'])
+                        tag['value'] = child.attrib['v']
 
                     elif tag['key'] == 'postcode':
-                        tag['value'] = clean.update_postcode(child.attrib['v'],
-                                                             re_library[-2])
+                        tag['value'] = clean.clean_postcode(child.attrib['v'],
+                                                            re_library[-2])
 
                     elif tag['key'] == 'city':
-                        tag['value'] = clean.update_city_name(child.attrib['v'],
-                                                              re_library[-1])
+                        tag['value'] = clean.clean_city_name(child.attrib['v'],
+                                                             re_library[-1])
 
                     # Leave other tag values unmodified
                     else:
@@ -192,7 +196,7 @@ def shape_element(element, node_attr_fields=NODE_FIELDS,
                             tag_list = child.attrib['v'].split(char)
 
                             # Strip blank spaces and apply mapping
-                            tag_list = [clean.update_cuisine(tag.strip(),
+                            tag_list = [clean.clean_cuisine(tag.strip(),
                                         re_library[-1]) for tag in tag_list]
 
                             # Create a set of unique tags from tag_list
@@ -221,7 +225,7 @@ def shape_element(element, node_attr_fields=NODE_FIELDS,
                     if child.attrib['v'].strip in generic_tags:
                         tag['value'] = 'north_american'
 
-                    tag['value'] = clean.update_cuisine(child.attrib['v']\
+                    tag['value'] = clean.clean_cuisine(child.attrib['v']\
                                     .strip(), re_library[-1])
                 else:
                     tag['value'] = child.attrib['v'].strip()
@@ -259,14 +263,14 @@ def shape_element(element, node_attr_fields=NODE_FIELDS,
 
 
 # Helper functions
-def get_element(osm_file, tags=('node', 'way', 'relation')):
-    """Yield element if it is the right type of tag"""
-    context = ET.iterparse(osm_file, events=('start', 'end'))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
+"""Parser backend for 'get_element': 'etree', 'lxml' or 'expat'. See parsers.py
+for the trade-offs of each.
+"""
+BACKEND = 'etree'
+
+def get_element(osm_file, tags=('node', 'way', 'relation'), backend=BACKEND):
+    """Yield element if it is the right type of tag, using the chosen backend"""
+    return parsers.get_element(osm_file, tags, backend)
 
 def validate_element(element, validator, schema=SCHEMA):
     """Raise ValidationError if element does not match schema"""
@@ -279,52 +283,285 @@ def validate_element(element, validator, schema=SCHEMA):
 
 
 # Main function
-def process_map(file_in, validate):
-    """Iteratively process each XML element and write to csv(s)"""
+"""Shaped elements are collected into column buffers, one list per field, and
+written BATCH_SIZE rows at a time: to csv, as tuples through csv.writer, or to
+Parquet, as typed Arrow columns that the SQL stage can load without parsing
+text again.
+"""
+BATCH_SIZE = 200000
+TABLES = ['nodes', 'nodes_tags', 'ways', 'ways_nodes', 'ways_tags']
+SHAPED_KEYS = ['node', 'node_tags', 'way', 'way_nodes', 'way_tags']
+ARROW_TYPES = {'integer': 'int64', 'float': 'float64', 'string': 'string'}
+
+def table_paths(output_directory=directory, output_format='csv'):
+    """Return the paths of the five OSM tables, e.g. './csv/nodes.csv'"""
+    return [os.path.join(output_directory, '{}.{}'.format(table, output_format))
+            for table in TABLES]
+
+def arrow_schema(shaped_key, schema=SCHEMA):
+    """Return the pyarrow schema of a table, with the types in schema.py"""
+    import pyarrow as pa
+
+    rules = schema[shaped_key]['schema']
+    if schema[shaped_key]['type'] == 'list':
+        rules = rules['schema']
+    fields = FIELDS[SHAPED_KEYS.index(shaped_key)]
+
+    return pa.schema([(field, ARROW_TYPES[rules[field]['type']])
+                      for field in fields])
+
+"""Shaped elements can also be inserted directly into the SQLite database of
+csv_to_sql.py, skipping the csv stage: each flush is one executemany call of a
+prepared INSERT statement, fed by a generator over the column buffers, and one
+committed transaction. The five OSM tables are emptied first, so a new run
+replaces their content. With OUTPUT_FORMAT = 'sqlite', the script also fills
+the 'municipalities' table (section B), and csv_to_sql.py is not needed.
+"""
+OUTPUT_FORMAT = 'csv'       # One of 'csv', 'parquet' or 'sqlite'
+SQLITE_DATABASE = 'milan_italy.db'
+
+def write_tables(elements, validate, paths=None, output_format='csv',
+                 batch_size=BATCH_SIZE, database=SQLITE_DATABASE):
+    """Shape each XML element and write the results to csv or Parquet tables,
+    or insert them into a SQLite database.
 
-    """Replace 'wb' with 'w' and 'UnicodeDictWriter()' with 'csv.DictWriter()',
-    to reflect conversion from Python 2 to Python 3 [3].
+    Arguments:
+        elements -- iterable of Element. Output of 'get_element'.
+        validate -- bool. If True, validate each shaped element.
+
+    Keyword arguments:
+        paths -- list of str. Paths of the nodes, nodes_tags, ways, ways_nodes
+            and ways_tags tables (default None, 'table_paths').
+        output_format -- str. One of 'csv', 'parquet' or 'sqlite' (default
+            'csv').
+        batch_size -- int. Rows buffered per table before each flush.
+        database -- str. The SQLite database, if output_format is 'sqlite'.
+            Tables are created from the SQL schema if missing; existing rows
+            of the five OSM tables are deleted.
     """
-    with codecs.open(NODES_PATH, 'w') as nodes_file, \
-         codecs.open(NODE_TAGS_PATH, 'w') as nodes_tags_file, \
-         codecs.open(WAYS_PATH, 'w') as ways_file, \
-         codecs.open(WAY_NODES_PATH, 'w') as way_nodes_file, \
-         codecs.open(WAY_TAGS_PATH, 'w') as way_tags_file:
-
-        nodes_writer = csv.DictWriter(nodes_file, NODE_FIELDS)
-        node_tags_writer = csv.DictWriter(nodes_tags_file, NODE_TAGS_FIELDS)
-        ways_writer = csv.DictWriter(ways_file, WAY_FIELDS)
-        way_nodes_writer = csv.DictWriter(way_nodes_file, WAY_NODES_FIELDS)
-        way_tags_writer = csv.DictWriter(way_tags_file, WAY_TAGS_FIELDS)
-
-        nodes_writer.writeheader()
-        node_tags_writer.writeheader()
-        ways_writer.writeheader()
-        way_nodes_writer.writeheader()
-        way_tags_writer.writeheader()
+    from contextlib import ExitStack
+
+    if output_format not in ('csv', 'parquet', 'sqlite'):
+        raise ValueError("output_format must be 'csv', 'parquet' or 'sqlite'")
+    if paths is None:
+        paths = table_paths(output_format=output_format)
+
+    buffers = [[[] for _ in fields] for fields in FIELDS]
+
+    with ExitStack() as stack:
+        if output_format == 'csv':
+            writers = []
+            for path, fields in zip(paths, FIELDS):
+                writer = csv.writer(stack.enter_context(
+                    open(path, 'w', newline='')))
+                writer.writerow(fields)
+                writers.append(writer)
+
+            def flush(i):
+                writers[i].writerows(zip(*buffers[i]))
+        elif output_format == 'sqlite':
+            import sqlite3
+
+            conn = sqlite3.connect(database)
+            stack.callback(conn.close)
+            create_tables(conn)
+            with conn:
+                clear_tables(conn, TABLES)
+            statements = [insert_statement(table, fields)
+                          for table, fields in zip(TABLES, FIELDS)]
+
+            def flush(i):
+                with conn:
+                    conn.executemany(statements[i], zip(*buffers[i]))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schemas = [arrow_schema(key) for key in SHAPED_KEYS]
+            writers = [stack.enter_context(pq.ParquetWriter(path, schema))
+                       for path, schema in zip(paths, schemas)]
+
+            def flush(i):
+                """Build typed columns, converting strings on the Arrow side"""
+                columns = [pa.array(column).cast(field.type)
+                           for column, field in zip(buffers[i], schemas[i])]
+                writers[i].write_table(pa.Table.from_arrays(
+                    columns, schema=schemas[i]))
+
+        def append(i, row):
+            for column, field in zip(buffers[i], FIELDS[i]):
+                column.append(row[field])
+
+        def flush_full(i):
+            if len(buffers[i][0]) >= batch_size:
+                flush(i)
+                buffers[i] = [[] for _ in FIELDS[i]]
 
         validator = cerberus.Validator()
 
-        for element in get_element(file_in, tags=('node', 'way')):
+        for element in elements:
             el = shape_element(element)
             if el:
                 if validate is True:
                     validate_element(el, validator)
 
-                if element.tag == 'node':
-                    nodes_writer.writerow(el['node'])
-                    node_tags_writer.writerows(el['node_tags'])
-                elif element.tag == 'way':
-                    ways_writer.writerow(el['way'])
-                    way_nodes_writer.writerows(el['way_nodes'])
-                    way_tags_writer.writerows(el['way_tags'])
+                for i, key in enumerate(SHAPED_KEYS):
+                    if key in el:
+                        rows = el[key]
+                        if isinstance(rows, dict):
+                            append(i, rows)
+                        else:
+                            for row in rows:
+                                append(i, row)
+                        flush_full(i)
+
+        # Write the remainder of every buffer
+        for i in range(len(TABLES)):
+            if buffers[i][0]:
+                flush(i)
+
+def process_map(file_in, validate, backend=BACKEND, output_format='csv'):
+    """Iteratively process each XML element and write to csv(s), Parquet or
+    directly to the SQLite database.
+    """
+    write_tables(get_element(file_in, tags=('node', 'way'), backend=backend),
+                 validate, output_format=output_format)
+
+
+"""Parallel processing of large OSM files.
+
+Top level elements in an OSM file are independent, so the file can be split
+into byte ranges at <node>, <way> or <relation> boundaries, each parsed and
+shaped in a separate process. Every process writes its own partial csvs, which
+are finally concatenated in file order: the result is the same as that of
+'process_map'.
+"""
+TOP_LEVEL_RE = re.compile(rb'<(node|way|relation)[\s/>]')
+
+def element_boundaries(file_in, chunk_bytes):
+    """Return (start, end) byte ranges splitting top level OSM elements.
+
+    Arguments:
+        file_in -- str. Path to the OSM file.
+        chunk_bytes -- int. Approximate size of each range, in bytes.
+
+    Returns:
+        A list of (start, end) tuples. Each range starts at the beginning of a
+        top level element, and the last one ends before the closing </osm>.
+    """
+    file_size = os.path.getsize(file_in)
+    window = 1 << 20
+
+    with open(file_in, 'rb') as f:
+
+        def next_boundary(offset):
+            """Position of the first top level tag at or after offset"""
+            while offset < file_size:
+                f.seek(offset)
+
+                # Overlap windows, so that a tag across two reads is found
+                data = f.read(window + 16)
+                match = TOP_LEVEL_RE.search(data)
+                if match and match.start() < window:
+                    return offset + match.start()
+                offset += window
+            return None
+
+        first = next_boundary(0)
+        if first is None:
+            return []
+
+        # Closing tag of the root element, within the last few bytes
+        f.seek(max(file_size - window, 0))
+        tail = f.read()
+        if tail.rfind(b'</osm>') < 0:
+            raise ValueError("No closing </osm> tag in the last {} bytes of "
+                             "'{}': the file may be truncated.".format(
+                                 len(tail), file_in))
+        end = file_size - len(tail) + tail.rfind(b'</osm>')
+
+        starts = [first]
+        for offset in range(first + chunk_bytes, end, chunk_bytes):
+            boundary = next_boundary(offset)
+            if boundary is None or boundary >= end:
+                break
+            if boundary > starts[-1]:
+                starts.append(boundary)
+
+    return list(zip(starts, starts[1:] + [end]))
+
+def partial_paths(directory, index):
+    """Return the paths of the partial csvs written for one byte range"""
+    return [os.path.join(directory, '{}_{:05d}.csv'.format(table, index))
+            for table in TABLES]
+
+def process_range(args):
+    """Parse, shape and write to partial csvs the elements in a byte range"""
+    file_in, start, end, index, directory, validate, backend = args
+
+    with open(file_in, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    # Wrap the range in a root element, to parse it as a standalone document
+    document = io.BytesIO(b'<osm>' + data + b'</osm>')
+    write_tables(get_element(document, tags=('node', 'way'), backend=backend),
+                 validate, partial_paths(directory, index))
+
+def process_map_parallel(file_in, validate, processes=None,
+                         chunk_bytes=64 * 2 ** 20, backend=BACKEND):
+    """Process the OSM file in parallel byte ranges and write to csv(s).
+
+    Arguments:
+        file_in -- str. Path to the OSM file.
+        validate -- bool. If True, validate each shaped element.
+
+    Keyword arguments:
+        processes -- int. Number of worker processes (default None, i.e.
+            os.cpu_count()).
+        chunk_bytes -- int. Approximate size of each byte range. Each worker
+            holds one range in memory at a time (default 64 MB).
+        backend -- str. Parser backend of 'get_element' (default BACKEND).
+    """
+    ranges = element_boundaries(file_in, chunk_bytes)
+    partial_directory = tempfile.mkdtemp(prefix='partial_', dir=directory)
+
+    try:
+        tasks = [(file_in, start, end, index, partial_directory, validate,
+                  backend) for index, (start, end) in enumerate(ranges)]
+        with multiprocessing.Pool(processes) as pool:
+            for _ in pool.imap(process_range, tasks):
+                pass
+
+        # Concatenate partial csvs in file order, keeping the first header
+        for i, final_path in enumerate(table_paths()):
+            with open(final_path, 'w', newline='') as output:
+                if not tasks:
+                    output.write(','.join(FIELDS[i]) + '\r\n')
+                for index in range(len(tasks)):
+                    with open(partial_paths(partial_directory, index)[i],
+                              'r', newline='') as partial:
+                        header = partial.readline()
+                        if index == 0:
+                            output.write(header)
+                        shutil.copyfileobj(partial, output)
+    finally:
+        shutil.rmtree(partial_directory)
 
 
 if __name__ == '__main__':
     """Note: Validation is ~ 10X slower. For the project consider using a small
     sample of the map when validating.
     """
-    process_map(OSM_PATH, validate=False)
+    process_map(OSM_PATH, validate=False, output_format=OUTPUT_FORMAT)
+
+    # Check that the cleaning caches are effective
+    for feature, info in clean.cache_info().items():
+        print('{} cache: {:.1%} hit rate ({} hits, {} misses)'.format(
+            feature, info['hit_rate'], info['hits'], info['misses']))
+
+    # For full-region extracts, parse byte ranges in parallel instead:
+    # process_map_parallel(OSM_PATH, validate=False)
 
 
 """B. ADDITIONAL SOURCES
@@ -339,40 +576,6 @@ zipped file available at: http://lab.comuni-italiani.it/files/listacomuni.zip
 Unzip before running this script.
 """
 
-# Store the content of the txt file in a Pandas DataFrame object
-df = pd.read_csv('listacomuni.txt', delimiter=';', encoding='latin-1')
-
-# Drop unnecessary columns
-df.drop(['Istat', 'Prefisso', 'CodFisco', 'Link'], axis=1, inplace=True)
-
-# Rename remaining columns for SQL table
-df.rename(columns = {'Comune': 'municipality', \
-                    'Provincia': 'province_code', \
-                    'Regione': 'region', \
-                    'CAP': 'postcode', \
-                    'Abitanti': 'population'}, inplace=True)
-
-# Add 'province' column to store the full name of the province (Lombardy only)
-df['province'] = df['province_code']
-
-df['province'].replace(['BG', 'BS', 'CO', 'CR', 'LC', 'LO', 'MN', 'MI', \
-                        'MB', 'PV', 'SO', 'VA'], \
-                        ['Bergamo', 'Brescia', 'Como', 'Cremona', 'Lecco', \
-                        'Lodi', 'Mantova', 'Milano', 'Monza-Brianza', \
-                        'Pavia', 'Sondrio', 'Varese'], inplace=True)
-
-# Replace Region code with full name
-df['region'].replace(['LOM'], ['Lombardy'], inplace=True)
-
-# Sort DataFrame columns
-sorted_cols = ['municipality', 'province', 'province_code', 'region', \
-                'postcode', 'population']
-
-df = df.reindex(columns=sorted_cols)
-
-# Single out municipalities in the Lombardy Region, store in 'data'
-data = df.loc[df['region'] == 'Lombardy']
-
 """Three cities in the DataFrame have multiple postcodes: Milano (201xx),
 Bergamo (241xx), and Brescia (251xx). To avoid data type inconsistencies in
 the SQL database, replace 'xx' with '00', the 'neutral' code, applying function
@@ -385,8 +588,77 @@ def ends_with_xx(df, postcode):
         df['postcode'] = df['postcode'][:-2] + '00'
     return df
 
-# Use lambda function on each entry in the df['postcode'] column [5]
-data = data.apply(lambda df: ends_with_xx(df, df['postcode']), axis=1)
+def municipalities(txt_file='listacomuni.txt'):
+    """Return the municipalities in Lombardy, with the fields of the SQL table
+    'municipalities', from the raw .txt file.
+    """
+    # Store the content of the txt file in a Pandas DataFrame object
+    df = pd.read_csv(txt_file, delimiter=';', encoding='latin-1')
+
+    # Drop unnecessary columns
+    df.drop(['Istat', 'Prefisso', 'CodFisco', 'Link'], axis=1, inplace=True)
+
+    # Rename remaining columns for SQL table
+    df.rename(columns = {'Comune': 'municipality', \
+                        'Provincia': 'province_code', \
+                        'Regione': 'region', \
+                        'CAP': 'postcode', \
+                        'Abitanti': 'population'}, inplace=True)
+
+    # Add 'province' column to store the full name of the province (Lombardy
+    # only)
+    df['province'] = df['province_code']
+
+    df['province'] = df['province'].replace(
+        ['BG', 'BS', 'CO', 'CR', 'LC', 'LO', 'MN', 'MI', 'MB', 'PV', 'SO', 'VA'],
+        ['Bergamo', 'Brescia', 'Como', 'Cremona', 'Lecco', 'Lodi', 'Mantova',
+         'Milano', 'Monza-Brianza', 'Pavia', 'Sondrio', 'Varese'])
+
+    # Replace Region code with full name
+    df['region'] = df['region'].replace(['LOM'], ['Lombardy'])
+
+    # Sort DataFrame columns
+    sorted_cols = ['municipality', 'province', 'province_code', 'region', \
+                    'postcode', 'population']
+
+    df = df.reindex(columns=sorted_cols)
+
+    # Single out municipalities in the Lombardy Region, store in 'data'
+    data = df.loc[df['region'] == 'Lombardy']
+
+    # Use lambda function on each entry in the df['postcode'] column [5]
+    return data.apply(lambda df: ends_with_xx(df, df['postcode']), axis=1)
+
+def municipalities_to_sql(df, database=SQLITE_DATABASE):
+    """Insert the output of 'municipalities' into the SQL table of the same
+    name, replacing its rows. Works on a new database, or on one already
+    holding the OSM tables, e.g. after a direct load.
+    """
+    import sqlite3
+
+    conn = sqlite3.connect(database)
+    try:
+        create_tables(conn)
+        with conn:
+            clear_tables(conn, ['municipalities'])
+            conn.executemany(insert_statement('municipalities', list(df)),
+                             df.itertuples(index=False, name=None))
+    finally:
+        conn.close()
+
+
+"""Only write the file when run as a script: worker processes of
+'process_map_parallel' may import this module again (with the 'spawn' or
+'forkserver' start methods), and must not rewrite it concurrently.
+"""
+if __name__ == '__main__':
+
+    df = municipalities()
+
+    # Store DataFrame in .csv file 'municipalities.csv'; do not write Pandas
+    # index
+    df.to_csv(directory + 'municipalities.csv', index=False)
 
-# Store DataFrame in .csv file 'municipalities.csv'; do not write Pandas index
-data.to_csv(directory + 'municipalities.csv', index=False)
+    # With a direct load, the database is complete without csv_to_sql.py
+    if OUTPUT_FORMAT == 'sqlite':
+        municipalities_to_sql(df)
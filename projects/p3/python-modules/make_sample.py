@@ -18,7 +18,7 @@ References
 """
 
 # Import required libraries
-import xml.etree.cElementTree as ET
+import parsers
 
 """Single out region name by stripping the .osm extension from the original
 filename, add '_sample.osm' to obtain sample file filename.
@@ -33,14 +33,14 @@ document. As of November 2017, the sample size is ~850/k MB.
 """
 k = 100     # Resulting sample ~8.5 MB.
 
-def get_element(osm_file, tags=('node', 'way', 'relation')):
+"""Parser backend for 'get_element': 'etree', 'lxml' or 'expat'. See parsers.py
+for the trade-offs of each.
+"""
+BACKEND = 'etree'
+
+def get_element(osm_file, tags=('node', 'way', 'relation'), backend=BACKEND):
     """Yield element if it is the right type of tag [2]."""
-    context = iter(ET.iterparse(osm_file, events=('start', 'end')))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
+    return parsers.get_element(osm_file, tags, backend)
 
 # Write sample file
 with open(SAMPLE_FILE, 'w') as output:
@@ -49,6 +49,6 @@ with open(SAMPLE_FILE, 'w') as output:
 
     for i, element in enumerate(get_element(OSM_FILE)):
         if i % k == 0:
-            output.write(ET.tostring(element, encoding='unicode'))
+            output.write(parsers.tostring(element))
 
     output.write('</osm>')
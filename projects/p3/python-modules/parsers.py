@@ -0,0 +1,153 @@
+"""Parser backends to stream the top level elements of an OSM file, used by
+'get_element' in make_sample.py and data.py:
+ - 'etree': xml.etree.cElementTree.iterparse, clearing the root after each
+   element (the original implementation);
+ - 'lxml': lxml.etree.iterparse, filtered on top level tags, clearing each
+   element and deleting its already processed siblings;
+ - 'expat': a bare expat handler yielding lightweight 'Record' objects in
+   place of Element trees.
+
+All backends yield objects with 'tag' and 'attrib' attributes, which iterate
+over their children, so 'shape_element' works unchanged on any of them.
+
+Note: Place this script in the same folder as the other modules. The 'lxml'
+      backend requires the lxml package. Use Python 3 to run this script.
+
+* Auxiliary module 3 of 3
+
+2017 - Federico Maria Massari / federico.massari@bocconialumni.it
+"""
+
+import xml.etree.cElementTree as ET
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+
+TOP_LEVEL_TAGS = ('node', 'way', 'relation')
+
+# Bytes read from the file between two batches of expat records
+EXPAT_READ_SIZE = 2 ** 16
+
+def iterparse_etree(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield element if it is the right type of tag"""
+    context = ET.iterparse(osm_file, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end' and elem.tag in tags:
+            yield elem
+            root.clear()
+
+def iterparse_lxml(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield element if it is the right type of tag, using lxml.
+
+    Only top level elements generate events. Once processed, each is cleared
+    and removed from the root together with all its preceding siblings, so the
+    tree never grows.
+    """
+    from lxml import etree
+
+    for event, elem in etree.iterparse(osm_file, events=('end',),
+                                       tag=TOP_LEVEL_TAGS):
+        if elem.tag in tags:
+            yield elem
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+class Record(object):
+    """Lightweight stand-in for an Element: tag, attributes and children."""
+    __slots__ = ('tag', 'attrib', 'children')
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+        self.children = []
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def iter(self, tag=None):
+        """Yield the record and all its descendants, optionally by tag"""
+        if tag is None or self.tag == tag:
+            yield self
+        for child in self.children:
+            yield from child.iter(tag)
+
+def iterparse_expat(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield a 'Record' for each top level element of the right type of tag.
+
+    The file is fed to expat in blocks of EXPAT_READ_SIZE bytes. Records are
+    only built below the root, and only those in 'tags' are kept once closed.
+    """
+    parser = expat.ParserCreate()
+    stack = []
+    ready = []
+
+    def start_element(tag, attrib):
+        record = Record(tag, attrib)
+        if len(stack) > 1:
+            stack[-1].children.append(record)
+        stack.append(record)
+
+    def end_element(tag):
+        record = stack.pop()
+        if len(stack) == 1 and tag in tags:
+            ready.append(record)
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+
+    f = osm_file if hasattr(osm_file, 'read') else open(osm_file, 'rb')
+    try:
+        while True:
+            data = f.read(EXPAT_READ_SIZE)
+            parser.Parse(data, not data)
+            yield from ready
+            del ready[:]
+            if not data:
+                break
+    finally:
+        if f is not osm_file:
+            f.close()
+
+BACKENDS = {'etree': iterparse_etree,
+            'lxml': iterparse_lxml,
+            'expat': iterparse_expat}
+
+def get_element(osm_file, tags=TOP_LEVEL_TAGS, backend='etree'):
+    """Yield the top level elements of the right type of tag.
+
+    Arguments:
+        osm_file -- str or file object. The OSM file to parse.
+
+    Keyword arguments:
+        tags -- tuple of str. Top level tags to yield (default 'node', 'way'
+            and 'relation').
+        backend -- str. One of 'etree', 'lxml' or 'expat' (default 'etree').
+
+    Returns:
+        A generator of Element (or, for 'expat', Record) objects. Each is only
+        valid until the next one is requested.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '{}', choose from: {}".format(
+            backend, ', '.join(sorted(BACKENDS))))
+    return BACKENDS[backend](osm_file, tags)
+
+def tostring(element):
+    """Serialise an element from any backend to a unicode XML string"""
+    if isinstance(element, Record):
+        attrib = ''.join(' {}={}'.format(key, quoteattr(value))
+                         for key, value in element.attrib.items())
+        if not element.children:
+            return '<{}{} />'.format(element.tag, attrib)
+        return '<{0}{1}>{2}</{0}>'.format(
+            element.tag, attrib, ''.join(map(tostring, element.children)))
+
+    if not isinstance(element, ET.Element):
+        from lxml import etree
+        return etree.tostring(element, encoding='unicode')
+
+    return ET.tostring(element, encoding='unicode')
@@ -5,7 +5,7 @@ type coercion functions.
 Note: Place this schema in the same folder as the data.py function.
       Use Python 3 to run this script.
 
-* Auxiliary module 1 of 1
+* Auxiliary module 1 of 3
 
 References
 -------------------------------------------------------------------------------